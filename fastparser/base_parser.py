@@ -1,32 +1,59 @@
 import re
-from typing import List, Union, Optional, Dict
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import List, Union, Optional, Dict, Tuple
 from urllib.parse import urlparse
 
 from selectolax.parser import HTMLParser
 from selectolax.parser import Node
 
-from .utilities import _URL, _CssSelector, make_absolute, fuzzy_search
+from .utilities import _URL, _CssSelector, make_absolute, fuzzy_search_batch
+from .utilities import split_url
 from .utilities import ilt_elements
 
 
 class Ahref:
     """Basic class for extracted Ahrefs
 
+    Slotted to keep link heavy pages small: the parsed url, the path split
+    and the lowercased text are computed on first use. The attributes of
+    the node are only kept when there is more than the href.
+
     :param href_node: selectolax node object
     :base_url: the url of the webpage
+    :base_netloc: netloc of base_url, parsed from base_url when not given
     """
 
-    def __init__(self, href_node: Node, base_url: _URL) -> None:
-        self.href: str = href_node.attributes.get("href")
+    __slots__ = (
+        "href",
+        "base_url",
+        "absolute_url",
+        "text",
+        "is_internal",
+        "_attributes",
+        "_path_split",
+        "_text_lower",
+    )
+
+    def __init__(
+        self, href_node: Node, base_url: _URL, base_netloc: Optional[str] = None
+    ) -> None:
+        attributes = href_node.attributes
+        self.href: str = attributes.get("href")
         if self.href and self.href.startswith(("#", "mailto:", "javascript:", "tel:")):
             raise ValueError("Not a normal url")
 
+        if base_netloc is None:
+            base_netloc = split_url(base_url).netloc
         self.base_url: str = base_url
         self.absolute_url: str = make_absolute(self.href, self.base_url)
         self.text: str = href_node.text()
-        self.parsed = urlparse(self.absolute_url)
-        self.is_internal: bool = self.parsed.netloc == urlparse(self.base_url).netloc
-        self.attributes: Dict[str, str] = href_node.attributes
+        self.is_internal: bool = split_url(self.absolute_url).netloc == base_netloc
+        self._attributes: Optional[Dict[str, str]] = (
+            attributes if len(attributes) > 1 else None
+        )
+        self._path_split: Optional[List[str]] = None
+        self._text_lower: Optional[str] = None
 
     def __repr__(self) -> str:
         return f"Ahref: {self.absolute_url}"
@@ -34,11 +61,42 @@ class Ahref:
     def __str__(self) -> str:
         return self.absolute_url
 
+    @property
+    def parsed(self):
+        return urlparse(self.absolute_url)
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        if self._attributes is None:
+            return {"href": self.href}
+        return self._attributes
+
     @property
     def path_split(self) -> List[str]:
-        parsed = urlparse(self.absolute_url)
+        if self._path_split is None:
+            path = split_url(self.absolute_url).path
+            self._path_split = [item.lower() for item in path.split("/") if item]
+        return self._path_split
 
-        return [item.lower() for item in parsed.path.split("/") if len(item) > 0]
+    @property
+    def text_lower(self) -> str:
+        if self._text_lower is None:
+            self._text_lower = self.text.lower()
+        return self._text_lower
+
+
+@dataclass
+class PageSummary:
+    """What is left of a BasePage after extraction: its links and text"""
+
+    url: str
+    internal_links: List[str] = field(default_factory=list)
+    external_links: List[str] = field(default_factory=list)
+    text: str = ""
+
+    @property
+    def links(self) -> List[str]:
+        return self.internal_links + self.external_links
 
 
 class BasePage:
@@ -51,6 +109,15 @@ class BasePage:
 
     next_symbol = ["volgende", "next", "meer", "more", "ouder", "older"]
     prev_symbol = ["vorige", "previous", "nieuwe", "new"]
+    invisible_tags = {
+        "head",
+        "script",
+        "noscript",
+        "style",
+        "iframe",
+        "noembed",
+        "noframes",
+    }
 
     def __init__(self, html: str, url: _URL):
         self.url: str = url
@@ -59,8 +126,8 @@ class BasePage:
             f"{self.parsed_url.scheme}://{self.parsed_url.hostname}/"
         )
         self._html_input: str = html
+        self.html_size: int = len(html)
         self._tree = HTMLParser(self._html_input)
-        self.links: List[Ahref] = self._get_links()
 
     def __hash__(self):
         return hash(self.url)
@@ -123,36 +190,64 @@ class BasePage:
         if isinstance(to_search, str):
             to_search = [to_search]
 
-        # Select list of Ahrefs from which to pick
-        link_list = []
-        if internal:
-            link_list.extend(self.internal_links)
-        if external:
-            link_list.extend(self.external_links)
-
-        # Function that creates the list to be searched
-        def path_text(link: Ahref) -> List[str]:
-            return_list = []
+        if fuzzy_score:
+            # Select list of Ahrefs from which to pick
+            link_list = []
+            if internal:
+                link_list.extend(self.internal_links)
+            if external:
+                link_list.extend(self.external_links)
+
+            # Function that creates the list to be searched
+            def path_text(link: Ahref) -> List[str]:
+                return_list = []
+                if in_path:
+                    return_list.extend(link.path_split)
+                if in_text:
+                    return_list.append(link.text_lower)
+                return return_list
+
+            fuzz_extracts = fuzzy_search_batch(
+                to_search, [path_text(link) for link in link_list], fuzzy_score
+            )
+            return [
+                link
+                for link, fuzz_extract in zip(link_list, fuzz_extracts)
+                if fuzz_extract.score >= fuzzy_score
+            ]
+
+        ordered_links, path_index, text_index = self._link_index
+        nr_internal = len(self.internal_links)
+        positions = set()
+        for string in to_search:
+            string = string.lower()
             if in_path:
-                return_list.extend(link.path_split)
+                positions.update(path_index.get(string, ()))
             if in_text:
-                return_list.append(link.text)
-            return [path_text.lower() for path_text in return_list]
-
-        if fuzzy_score:
-            return_list = []
-            for link in link_list:
-                fuzz_extract = fuzzy_search(to_search, path_text(link))
-                if fuzz_extract.score >= fuzzy_score:
-                    return_list.append(link)
-            return return_list
+                positions.update(text_index.get(string, ()))
 
         return [
-            link
-            for link in link_list
-            if any(string.lower() in path_text(link) for string in to_search)
+            ordered_links[position]
+            for position in sorted(positions)
+            if (internal if position < nr_internal else external)
         ]
 
+    @cached_property
+    def _link_index(
+        self,
+    ) -> Tuple[List[Ahref], Dict[str, List[int]], Dict[str, List[int]]]:
+        """Internal then external links, with the positions of the links
+        per lowercased path segment and per lowercased link text
+        """
+        ordered_links = self.internal_links + self.external_links
+        path_index: Dict[str, List[int]] = {}
+        text_index: Dict[str, List[int]] = {}
+        for position, link in enumerate(ordered_links):
+            for segment in link.path_split:
+                path_index.setdefault(segment, []).append(position)
+            text_index.setdefault(link.text_lower, []).append(position)
+        return ordered_links, path_index, text_index
+
     @classmethod
     def get_parent(cls, node: Node, depth: int = 1) -> Node:
         parent_node = node.parent
@@ -187,20 +282,68 @@ class BasePage:
 
         return cls.get_first_block(node.parent)
 
+    @cached_property
+    def links(self) -> List[Ahref]:
+        """Ahrefs of the page, extracted on first access"""
+        return self._get_links()
+
+    @cached_property
+    def _partitioned_links(self) -> Tuple[List[Ahref], List[Ahref]]:
+        internal, external = [], []
+        for link in self.links:
+            if link.is_internal:
+                internal.append(link)
+            else:
+                external.append(link)
+        return internal, external
+
     @property
     def internal_links(self) -> List[Ahref]:
-        return [link for link in self.links if link.is_internal]
+        return self._partitioned_links[0]
 
     @property
     def external_links(self) -> List[Ahref]:
-        return [link for link in self.links if not link.is_internal]
+        return self._partitioned_links[1]
 
-    @property
+    @cached_property
     def text(self) -> str:
-        new_tree = HTMLParser(self._html_input)
-        tags = ["head", "script", "noscript", "style", "iframe", "noembed", "noframes"]
-        new_tree.strip_tags(tags)
-        return new_tree.text(separator=" ").strip()
+        """Visible text of the body, text nodes joined by a space
+
+        Walks the parsed tree and skips the subtrees of invisible_tags, so
+        the document is not parsed again.
+        """
+        body = self._tree.body
+        if body is None:
+            return ""
+
+        parts = []
+        stack = []
+        node = body.child
+        while node is not None:
+            tag = node.tag
+            if tag == "-text":
+                parts.append(node.text())
+            elif tag not in self.invisible_tags and node.child is not None:
+                stack.append(node.next)
+                node = node.child
+                continue
+            node = node.next
+            while node is None and stack:
+                node = stack.pop()
+
+        return " ".join(parts).strip()
+
+    def summary(self) -> PageSummary:
+        return PageSummary(
+            url=self.url,
+            internal_links=[link.absolute_url for link in self.internal_links],
+            external_links=[link.absolute_url for link in self.external_links],
+            text=self.text,
+        )
+
+    def release_html(self) -> None:
+        """Drops the HTML string, the parsed tree is all the page needs"""
+        self._html_input = None
 
     @property
     def next_page_url(self) -> _URL:
@@ -241,11 +384,12 @@ class BasePage:
     def _get_links(self) -> List[Ahref]:
         return_list = []
         ahrefs = self._tree.css("a[href]")
+        base_netloc = self.parsed_url.netloc
 
         for a_node in ahrefs:
             if a_node.attributes["href"] and not a_node.attributes["href"].startswith(
                 ("#", "javascript:", "mailto:", "tel:")
             ):
-                return_list.append(Ahref(a_node, self.url))
+                return_list.append(Ahref(a_node, self.url, base_netloc))
 
         return return_list
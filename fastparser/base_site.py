@@ -1,14 +1,20 @@
 import asyncio
+from enum import Enum
 from urllib.parse import urlparse, urlunparse
-from typing import Optional, Dict
-import json
+from typing import Optional, Dict, Union, List
 import os
 
-from lxml import etree
-
 from .http_client import HttpResponse
-from .utilities import _URL
-from .base_parser import BasePage
+from .utilities import _URL, approx_size, fingerprint
+from .base_parser import BasePage, PageSummary
+from .canonical import UrlCanonicalizer
+from .exporters import Exporter, JsonLinesExporter
+from .serialize import dumps, loads
+from .frontier import Sitemap
+from .parse_pool import ParseExecutor
+from .seen import BloomFilter
+from .sitemap_xml import iter_sitemap
+from .store import ItemStore
 
 
 class SitemapItem:
@@ -19,17 +25,34 @@ class SitemapItem:
         status_code: Optional[int] = None,
         page: Optional[BasePage] = None,
         redirect: Optional[_URL] = None,
+        lastmod: Optional[str] = None,
+        priority: Optional[float] = None,
     ):
         self._depth = depth
         # Trailing slashes will be trimmed
         parsed = urlparse(url)
         self.path = parsed.path
         self.url = urlunparse((parsed.scheme, parsed.netloc, parsed.path, "", "", ""))
+        # kept for canonicalizers that allow some query params
+        self.query = parsed.query
         self.entry = None
         self.status_code = status_code
         self.page = page
         self.redirect = redirect
+        # from the sitemap.xml
+        self.lastmod = lastmod
+        self.priority = priority
+        # hash of the fetched page and how often it changed between crawls
+        self.fingerprint: Optional[str] = None
+        self.changes = 0
+        self._rank = 0.0
+        # bytes retain counted for the page (or summary) and the data
+        self._retained_page_bytes = 0
+        self._retained_data_bytes = 0
+        self.summary: Optional[PageSummary] = None
         self.data = {}
+        # Set by the Frontier while the item waits to be visited
+        self._frontier = None
 
     def __hash__(self) -> int:
         return hash(self.path)
@@ -40,6 +63,12 @@ class SitemapItem:
     def __repr__(self):
         return f"<SitemapItem: {self.url}>"
 
+    def canonicalize(self, canonicalizer: UrlCanonicalizer) -> None:
+        """Rewrites url and path to their canonical form"""
+        url = f"{self.url}?{self.query}" if self.query else self.url
+        self.url = canonicalizer(url)
+        self.path = urlparse(self.url).path
+
     @property
     def depth(self):
         return self._depth
@@ -48,27 +77,125 @@ class SitemapItem:
     def depth(self, depth: int):
         if depth < self._depth:
             self._depth = depth
+            # re-prioritise the item if it is still waiting in the frontier
+            if self._frontier is not None:
+                self._frontier.push(self)
 
     @property
-    def json(self):
+    def rank(self) -> float:
+        """Order of the item among the items of the same depth, highest first"""
+        return self._rank
+
+    @rank.setter
+    def rank(self, rank: float):
+        if rank != self._rank:
+            self._rank = rank
+            if self._frontier is not None:
+                self._frontier.push(self)
+
+    def to_dict(self) -> Dict:
+        """The exported record of the item, data keys included"""
         export_dict = {"path": self.url, "status_code": self.status_code}
+        if self.lastmod:
+            export_dict["lastmod"] = self.lastmod
+        if self.fingerprint:
+            export_dict["fingerprint"] = self.fingerprint
+            export_dict["changes"] = self.changes
         export_dict.update(self.data)
-        return json.dumps(export_dict)
+        return export_dict
+
+    @property
+    def json(self) -> str:
+        return dumps(self.to_dict()).decode("utf-8")
+
+
+class Retention(str, Enum):
+    """What a crawl keeps of a page after func and export ran
+
+    FULL keeps the BasePage, SUMMARY keeps a PageSummary (links and text)
+    and the item data, NONE keeps neither.
+    """
+
+    FULL = "full"
+    SUMMARY = "summary"
+    NONE = "none"
 
 
 class BaseSite:
-    """Base class for website"""
+    """Base class for website
+
+    :param url: url of the home page
+    :param export_path: file that export_page appends to
+    :param exporter: Exporter that writes the exported items, defaults to
+        a JsonLinesExporter of export_path. close closes it, run_site only
+        closes the default one
+    :param retention: what is kept of the crawled pages, see Retention
+    :param max_retained_bytes: once the retained pages take about this many
+        bytes, nothing more is kept of new pages
+    :param parse_executor: ParseExecutor that parses the pages in other
+        processes. The items then get a summary and extracted data, no page
+    :param canonicalizer: UrlCanonicalizer applied to every url before it
+        is added to the sitemap
+    :param seen_filter: BloomFilter of every url added to the sitemap, used
+        for the "already seen" check. A false positive skips a new url
+    :param spill_path: SQLite file that visited items are moved to, so the
+        sitemap only holds the frontier and the items in progress
+    :param previous_export: export of the previous crawl. New urls and urls
+        whose sitemap lastmod changed are crawled first, then the pages by
+        how often they changed before, unchanged urls last
+    :param skip_unchanged: urls whose lastmod did not change are not
+        fetched, they get status 304 and the data of the previous export
+    :param checkpoint_path: SQLite file the sitemap is checkpointed to while
+        crawling, see resume
+    :param checkpoint_every: number of processed items between checkpoints
+    """
 
-    def __init__(self, url: _URL, export_path: Optional[str] = None):
+    def __init__(
+        self,
+        url: _URL,
+        export_path: Optional[str] = None,
+        exporter: Optional[Exporter] = None,
+        retention: Union[Retention, str] = Retention.FULL,
+        max_retained_bytes: Optional[int] = None,
+        parse_executor: Optional[ParseExecutor] = None,
+        canonicalizer: Optional[UrlCanonicalizer] = None,
+        seen_filter: Optional[BloomFilter] = None,
+        spill_path: Optional[str] = None,
+        previous_export: Optional[str] = None,
+        skip_unchanged: bool = False,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_every: int = 100,
+    ):
         parsed_url = urlparse(url)
         if parsed_url.netloc == "":
             raise ValueError(f"{url} is not a valid url.")
         self.domain = parsed_url.netloc
         self.export_path = export_path if export_path else f"{self.domain}.json"
+        self.exporter = exporter
+        # a default exporter is made again after it is closed
+        self._owns_exporter = exporter is None
         self.scheme = parsed_url.scheme
-        home_item = SitemapItem(0, f"{self.scheme}://{self.domain}")
-        self.sitemap: Dict = {home_item.url: home_item}
+        self.canonicalizer = canonicalizer
+        self.seen_filter = seen_filter
+        self.spill_store = ItemStore(spill_path) if spill_path else None
+        self.previous: Dict[_URL, Dict] = (
+            self.load_previous(previous_export) if previous_export else {}
+        )
+        self.skip_unchanged = skip_unchanged
+        self.checkpoint_store = ItemStore(checkpoint_path) if checkpoint_path else None
+        self.checkpoint_every = checkpoint_every
+        # items changed since the last checkpoint
+        self._dirty: Dict[_URL, SitemapItem] = {}
+        self._processed_since_checkpoint = 0
+        self.sitemap: Sitemap = Sitemap()
+        self.item_to_sitemap(SitemapItem(0, f"{self.scheme}://{self.domain}"))
         self.digested: int = 0
+        # items visited by crawl, digested counts run_site pages twice
+        self.pages_visited: int = 0
+        self.retention = Retention(retention)
+        self.max_retained_bytes = max_retained_bytes
+        self.retained_bytes: int = 0
+        self.parse_executor = parse_executor
 
     @property
     def home_page(self):
@@ -81,20 +208,219 @@ class BaseSite:
     def __repr__(self) -> str:
         return f"<BaseSite: {self.domain}>"
 
+    @property
+    def frontier(self):
+        return self.sitemap.frontier
+
     def item_to_sitemap(self, item: SitemapItem) -> None:
-        if not self.sitemap.get(item.url):
+        if self.canonicalizer is not None:
+            item.canonicalize(self.canonicalizer)
+        existing = self.sitemap.get(item.url)
+        if existing:
+            # a shorter path to a known url lowers its depth
+            existing.depth = item.depth
+            existing.lastmod = existing.lastmod or item.lastmod
+            if existing.priority is None:
+                existing.priority = item.priority
+            existing.rank = self.recrawl_rank(existing)
+            self.mark_dirty(existing)
+            return
+        self._add_if_unseen(item)
+
+    def _add_if_unseen(self, item: SitemapItem) -> None:
+        """Adds an item that is not in the sitemap, unless it was seen before"""
+        if self.seen_filter is not None:
+            if item.url in self.seen_filter:
+                return
+            self.seen_filter.add(item.url)
+        elif self.spill_store is not None and item.url in self.spill_store:
+            return
+        item.rank = self.recrawl_rank(item)
+        self.sitemap[item.url] = item
+        self.mark_dirty(item)
+
+    def mark_dirty(self, item: SitemapItem) -> None:
+        """Queues item for the next checkpoint"""
+        if self.checkpoint_store is not None:
+            self._dirty[item.url] = item
+
+    def checkpoint(self) -> None:
+        """Writes the items changed since the last checkpoint"""
+        if self.checkpoint_store is None:
+            return
+        self.checkpoint_store.put_many(self._dirty.values())
+        self.checkpoint_store.flush()
+        self._dirty = {}
+        self._processed_since_checkpoint = 0
+
+    def resume(self, path: Optional[str] = None) -> int:
+        """Loads the sitemap from a checkpoint and keeps checkpointing to it
+
+        Visited items are not fetched again and count as visited, so
+        max_pages of build_site and run_site includes the pages of the
+        earlier run. Returns the number of loaded items.
+
+        :param path: checkpoint file, defaults to checkpoint_path
+        """
+        if path is not None and (
+            self.checkpoint_store is None or self.checkpoint_store.path != path
+        ):
+            self.checkpoint_store = ItemStore(path)
+        if self.checkpoint_store is None:
+            raise ValueError("resume needs a checkpoint path")
+
+        loaded = 0
+        for item in self.checkpoint_store:
+            loaded += 1
+            # the stored row is newer than the item it replaces
+            self._dirty.pop(item.url, None)
+            if self.seen_filter is not None:
+                self.seen_filter.add(item.url)
+            if item.status_code is not None:
+                self.pages_visited += 1
+                # 304s were reused from a previous export, not fetched
+                if item.status_code != 304:
+                    self.digested += 1
+                if self.spill_store is not None:
+                    self.spill_store.put(item)
+                    replaced = self.sitemap.pop(item.url, None)
+                    if replaced is not None:
+                        replaced._frontier = None
+                    continue
+            item.rank = self.recrawl_rank(item)
             self.sitemap[item.url] = item
+        if self.spill_store is not None:
+            self.spill_store.flush()
+        return loaded
+
+    @staticmethod
+    def load_previous(path: str) -> Dict[_URL, Dict]:
+        """Reads an export into a dict of url: exported item"""
+        previous = {}
+        if not os.path.isfile(path):
+            return previous
+        with open(path, "r") as export_file:
+            for line in export_file:
+                if line.strip():
+                    record = loads(line)
+                    previous[record["path"]] = record
+        return previous
+
+    def is_unchanged(self, item: SitemapItem) -> bool:
+        """True when the sitemap lastmod of item is the one of the last crawl"""
+        record = self.previous.get(item.url)
+        return bool(record and item.lastmod and record.get("lastmod") == item.lastmod)
+
+    def recrawl_rank(self, item: SitemapItem) -> float:
+        """Rank of item in an incremental crawl
+
+        New and changed urls rank above 1, pages without a lastmod rank by
+        how often they changed before and unchanged urls rank -1.
+        """
+        if not self.previous:
+            return 0.0
+        record = self.previous.get(item.url)
+        if record is None:
+            return 2.0
+        changes = record.get("changes", 0)
+        history = changes / (changes + 1)
+        if not item.lastmod or not record.get("lastmod"):
+            return history
+        if self.is_unchanged(item):
+            return -1.0
+        return 1.0 + history
+
+    def reuse_previous(self, item: SitemapItem) -> bool:
+        """Fills in an unchanged item from the previous export
+
+        Returns True when the item does not have to be fetched.
+        """
+        if not self.skip_unchanged or not self.is_unchanged(item):
+            return False
+        record = dict(self.previous[item.url])
+        item.status_code = 304
+        item.fingerprint = record.pop("fingerprint", None)
+        item.changes = record.pop("changes", 0)
+        for key in ("path", "status_code", "lastmod"):
+            record.pop(key, None)
+        item.data.update(record)
+        return True
+
+    def track_changes(self, item: SitemapItem, content: Optional[bytes]) -> None:
+        """Fingerprints the page and counts a change since the previous crawl"""
+        item.fingerprint = fingerprint(content or b"")
+        record = self.previous.get(item.url)
+        if record is None:
+            return
+        changes = record.get("changes", 0)
+        if record.get("fingerprint") not in (None, item.fingerprint):
+            changes += 1
+        item.changes = changes
+
+    def spill(self, item: SitemapItem) -> None:
+        """Moves a visited item from the sitemap to the spill store"""
+        if self.spill_store is None or item.status_code is None:
+            return
+        self.spill_store.put(item)
+        if self.sitemap.get(item.url) is item:
+            del self.sitemap[item.url]
+        item.page = None
+        item.summary = None
+        self.retained_bytes -= item._retained_page_bytes + item._retained_data_bytes
+        item._retained_page_bytes = item._retained_data_bytes = 0
+
+    def drop_page(self, item: SitemapItem) -> None:
+        """Drops the page of item and frees the bytes retained for it"""
+        if item.page is None:
+            return
+        item.page = None
+        self.retained_bytes -= item._retained_page_bytes
+        item._retained_page_bytes = 0
+
+    def retain(self, item: SitemapItem, retention: Optional[Retention] = None):
+        """Drops what retention does not keep of the item's page
+
+        Adds the approximate size of what is kept to retained_bytes, drop_page
+        and spill subtract it again. Items parsed by a parse_executor only
+        have a summary, FULL keeps that.
+        """
+        if item.page is None and item.summary is None:
+            return
+        # counted again below
+        self.retained_bytes -= item._retained_page_bytes + item._retained_data_bytes
+        item._retained_page_bytes = item._retained_data_bytes = 0
+        retention = Retention(retention or self.retention)
+        if (
+            self.max_retained_bytes is not None
+            and self.retained_bytes >= self.max_retained_bytes
+        ):
+            retention = Retention.NONE
+
+        if retention == Retention.NONE:
+            item.page = None
+            item.summary = None
+            item.data = {}
+            return
 
-    def get_unvisited_item(self, max_depth: Optional[int] = None) -> SitemapItem:
-        if max_depth:
-            for sitemap_item in self.sitemap.values():
-                if sitemap_item.status_code is None:
-                    if sitemap_item.depth <= max_depth:
-                        return sitemap_item
+        if item.page is not None and retention == Retention.FULL:
+            item._retained_page_bytes = item.page.html_size
         else:
-            for sitemap_item in self.sitemap.values():
-                if sitemap_item.status_code is None:
-                    return sitemap_item
+            if item.page is not None:
+                item.summary = item.page.summary()
+                item.page = None
+            item._retained_page_bytes = approx_size(
+                [
+                    item.summary.internal_links,
+                    item.summary.external_links,
+                    item.summary.text,
+                ]
+            )
+        item._retained_data_bytes = approx_size(item.data)
+        self.retained_bytes += item._retained_page_bytes + item._retained_data_bytes
+
+    def get_unvisited_item(self, max_depth: Optional[int] = None) -> SitemapItem:
+        """Returns the shallowest unvisited item, oldest first"""
+        return self.frontier.peek(max_depth)
 
     async def get_url(self, url: _URL, client) -> HttpResponse:
         return await client.get(url)
@@ -106,38 +432,162 @@ class BaseSite:
         add_links_to_sitemap: bool = True,
     ):
         self.digested += 1
-        if 300 < response.status_code < 320:
+        # a 3xx without a Location header (e.g. a 304) has nowhere to go
+        if 300 < response.status_code < 320 and response.redirect:
             item.status_code = response.status_code
             redirect_item = SitemapItem(url=response.redirect, depth=item.depth)
             self.item_to_sitemap(redirect_item)
+            if redirect_item.url == item.url:
+                # e.g. a trailing slash redirect, the canonical url of the
+                # target is the item itself so the raw target is fetched
+                raw_item = SitemapItem(url=response.redirect, depth=item.depth)
+                if raw_item.url not in self.sitemap:
+                    self._add_if_unseen(raw_item)
             return
 
         if response.status_code == 200:
             item.page = BasePage(response.text, response.url)
             item.status_code = response.status_code
+            self.track_changes(item, response.content)
 
             if add_links_to_sitemap:
-                for a_href in item.page.internal_links:
-                    if a_href.absolute_url and not a_href.absolute_url.endswith(".pdf"):
-                        new_item = SitemapItem(
-                            depth=item.depth + 1, url=a_href.absolute_url
-                        )
-                        self.item_to_sitemap(new_item)
+                self.links_to_sitemap(
+                    item, [a_href.absolute_url for a_href in item.page.internal_links]
+                )
 
         else:
             item.status_code = response.status_code
 
+    async def digest(
+        self,
+        item: SitemapItem,
+        response: HttpResponse,
+        add_links_to_sitemap: bool = True,
+    ):
+        """digest_response that parses in the parse_executor when there is one
+
+        Parsed items get a summary and the extracted data instead of a page.
+        """
+        if self.parse_executor is None or response.status_code != 200:
+            self.digest_response(item, response, add_links_to_sitemap)
+            return
+
+        self.digested += 1
+        # run_site digests twice, the page is parsed only once
+        if item.summary is None or item.status_code != 200:
+            item.summary, data = await self.parse_executor.parse(response)
+            item.data.update(data)
+        item.status_code = response.status_code
+        self.track_changes(item, response.content)
+
+        if add_links_to_sitemap:
+            self.links_to_sitemap(item, item.summary.internal_links)
+
+    def links_to_sitemap(self, item: SitemapItem, urls: List[_URL]) -> None:
+        """Adds the links found on item one level deeper"""
+        for url in urls:
+            if url and not url.endswith(".pdf"):
+                new_item = SitemapItem(depth=item.depth + 1, url=url)
+                self.item_to_sitemap(new_item)
+
+    async def crawl(
+        self,
+        process,
+        max_depth: Optional[int] = None,
+        max_pages: Optional[int] = 20,
+        concurrency: int = 1,
+        digests_per_item: int = 1,
+    ) -> None:
+        """Runs concurrency workers that take unvisited items from the frontier
+
+        :param process: coroutine function called with every item. It fetches
+            and digests the item, a truthy return value stops the crawl
+        :param concurrency: number of workers. With 1 worker items are
+            processed in the same order as a sequential crawl
+        :param digests_per_item: number of times process digests an item,
+            max_pages counts digests so every page costs this many
+
+        No new items are taken when the crawl is stopped or when the digests
+        of the visited pages and of the pages in flight reach max_pages.
+        Workers that wait for an empty frontier wake up when another worker
+        finishes an item.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        condition = asyncio.Condition()
+        in_flight = 0
+        stopped = False
+
+        async def worker():
+            nonlocal in_flight, stopped
+            while True:
+                async with condition:
+                    while True:
+                        if stopped:
+                            return
+                        # pages_visited includes the pages of a resumed crawl
+                        pages = self.pages_visited + in_flight
+                        if (
+                            max_pages is not None
+                            and pages * digests_per_item >= max_pages
+                        ):
+                            return
+                        item = self.frontier.pop(max_depth)
+                        if item is not None:
+                            break
+                        if in_flight == 0:
+                            return
+                        await condition.wait()
+                    in_flight += 1
+
+                stop = True
+                try:
+                    stop = await process(item)
+                    if item.status_code is not None:
+                        self.pages_visited += 1
+                    self.mark_dirty(item)
+                    self._processed_since_checkpoint += 1
+                    if self._processed_since_checkpoint >= self.checkpoint_every:
+                        self.checkpoint()
+                finally:
+                    async with condition:
+                        in_flight -= 1
+                        if stop:
+                            stopped = True
+                        condition.notify_all()
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        finally:
+            self.checkpoint()
+            if self.spill_store is not None:
+                self.spill_store.flush()
+
     async def build_site(
         self,
         client,
         max_depth: Optional[int] = 2,
         max_pages: Optional[int] = 20,
+        concurrency: int = 1,
     ):
-        new_page = self.get_unvisited_item(max_depth=max_depth)
-        while new_page and self.digested < max_pages:
-            r = await self.get_url(new_page.url, client)
-            self.digest_response(new_page, r)
-            new_page = self.get_unvisited_item(max_depth=max_depth)
+        async def process(item: SitemapItem) -> bool:
+            if self.reuse_previous(item):
+                self.spill(item)
+                return False
+            r = await self.get_url(item.url, client)
+            await self.digest(item, r)
+            self.retain(item)
+            self.spill(item)
+            return False
+
+        await self.crawl(process, max_depth, max_pages, concurrency)
 
     async def run_site(
         self,
@@ -147,71 +597,134 @@ class BaseSite:
         max_pages: Optional[int] = 20,
         add_links_to_sitemap: bool = True,
         export: bool = False,
-        sleep: float = 0.5,
+        sleep: Optional[float] = None,
         delete_pages: bool = False,
+        concurrency: int = 1,
     ):
-        new_item = self.get_unvisited_item(max_depth=max_depth)
-        while new_item and self.digested < max_pages:
-            await asyncio.sleep(sleep)
+        """Crawls the site and calls func(self, item, response) for every page
+
+        When sleep is None the client's rate_limiter paces the requests per
+        host. Clients without a rate limiter sleep 0.5 seconds per request.
+        With a parse_executor func gets items with a summary and the
+        extracted data instead of a page.
+        """
+        if sleep is None:
+            sleep = 0 if getattr(client, "rate_limiter", None) else 0.5
 
-            r = await self.get_url(new_item.url, client)
+        async def process(item: SitemapItem) -> bool:
+            if self.reuse_previous(item):
+                if export:
+                    self.export_page(item)
+                self.spill(item)
+                return False
 
-            self.digest_response(new_item, r, False)
+            if sleep:
+                await asyncio.sleep(sleep)
+
+            r = await self.get_url(item.url, client)
+
+            await self.digest(item, r, False)
 
             # gets the new_item or redirected item back
-            self.digest_response(new_item, r, add_links_to_sitemap)
+            await self.digest(item, r, add_links_to_sitemap)
 
-            if new_item.page:
-                run = func(self, new_item, r)
+            if item.page or item.summary:
+                run = func(self, item, r)
             else:
                 run = None
                 print("No page to func")
                 print(r.url)
 
             # export the page data
-            if export and new_item is not None:
-                self.export_page(new_item)
+            if export and item is not None:
+                self.export_page(item)
+
+            self.retain(item)
+            self.spill(item)
 
             if run:
-                return
+                return True
 
             # for big sites it is better to delete the pages
             if delete_pages:
-                new_item.page = None
-
-            new_item = self.get_unvisited_item(max_depth=max_depth)
-            if not new_item:
-                print("no new item")
-                print(self.sitemap)
+                self.drop_page(item)
+
+            return False
+
+        try:
+            # every item is digested twice
+            await self.crawl(
+                process, max_depth, max_pages, concurrency, digests_per_item=2
+            )
+        finally:
+            if export:
+                # an exporter that was passed in can be shared by other sites
+                if self._owns_exporter:
+                    await self.close_export()
+                else:
+                    await self.flush_export()
+        if not self.get_unvisited_item(max_depth=max_depth):
+            print("no new item")
+            print(self.sitemap)
 
     async def parse_sitemap(
-        self, sitemap_url: str, client, in_url: Optional[str] = None
+        self,
+        sitemap_url: str,
+        client,
+        in_url: Optional[str] = None,
+        max_concurrency: int = 4,
     ):
-        resp = await self.get_url(sitemap_url, client)
-        if not resp:
-            return
-
-        parser = etree.XMLParser(recover=True)
-        tree = etree.fromstring(resp.content, parser=parser)
-        urlset = tree.findall("{http://www.sitemaps.org/schemas/sitemap/0.9}url")
-
-        for url in urlset:
-            link = url.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-
-            if in_url:
-                if in_url not in link.text:
-                    continue
-
-            new_item = SitemapItem(url=link.text, depth=10)
+        """Adds the urls of a sitemap.xml (or sitemap index) to the sitemap
+
+        :param in_url: only add urls that contain this string
+        :param max_concurrency: number of sitemaps of an index fetched at once
+        """
+        async for entry in iter_sitemap(
+            sitemap_url, client, max_concurrency=max_concurrency
+        ):
+            if in_url and in_url not in entry.loc:
+                continue
+
+            new_item = SitemapItem(
+                url=entry.loc,
+                depth=10,
+                lastmod=entry.lastmod,
+                priority=entry.priority,
+            )
             self.item_to_sitemap(new_item)
 
     def export_page(self, item: SitemapItem):
-        if not os.path.isfile(self.export_path):
-            with open(self.export_path, "w") as export_file:
-                export_file.write(item.json)
-                export_file.write("\n")
+        """Buffers the item in the exporter, see flush_export"""
+        if self.exporter is None:
+            self.exporter = JsonLinesExporter(self.export_path)
+        self.exporter.write(item.to_dict())
+
+    async def flush_export(self) -> None:
+        """Writes the buffered exports without blocking the event loop"""
+        if self.exporter is not None:
+            await asyncio.wrap_future(self.exporter.flush(wait=False))
+
+    async def close_export(self) -> None:
+        """Closes the exporter without blocking the event loop"""
+        if self.exporter is None or self.exporter.closed:
             return
-
-        with open(self.export_path, "a") as export_file:
-            export_file.write(item.json)
-            export_file.write("\n")
\ No newline at end of file
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.exporter.close)
+        if self._owns_exporter:
+            self.exporter = None
+
+    def close(self) -> None:
+        """Closes the exporter and writes the last checkpoint"""
+        if self.exporter is not None:
+            self.exporter.close()
+            if self._owns_exporter:
+                self.exporter = None
+        self.checkpoint()
+        if self.spill_store is not None:
+            self.spill_store.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
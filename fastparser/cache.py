@@ -0,0 +1,192 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict
+
+from .http_client import HttpResponse
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    status_code: int
+    encoding: Optional[str]
+    content_type: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content: bytes
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """Headers that make a request conditional on this entry"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def response(self) -> HttpResponse:
+        return HttpResponse(
+            url=self.url,
+            encoding=self.encoding,
+            status_code=self.status_code,
+            content=self.content,
+            content_type=self.content_type,
+            from_cache=True,
+        )
+
+
+class ResponseCache:
+    """On-disk cache of responses that have an ETag or Last-Modified
+
+    Cached urls are requested with If-None-Match / If-Modified-Since, a 304
+    is answered with the cached response. The least recently used entries
+    are evicted past max_entries or past max_bytes of bodies.
+
+    Access times of get are kept in memory and written every
+    access_batch reads, or on the next store or close.
+
+    :param path: path of the SQLite file
+    :param max_entries: max number of cached responses
+    :param max_bytes: max total size of the cached bodies
+    :param access_batch: number of reads between access time writes
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        access_batch: int = 100,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.access_batch = access_batch
+        # url: access time, not written yet
+        self._accessed: Dict[str, int] = {}
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status_code INTEGER,
+                encoding TEXT,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                content BLOB,
+                size INTEGER,
+                accessed INTEGER
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._db.commit()
+        count, size = self._db.execute(
+            "SELECT COUNT(*), SUM(size) FROM responses"
+        ).fetchone()
+        self._count: int = count
+        self._size: int = size or 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, url: str) -> bool:
+        row = self._db.execute(
+            "SELECT 1 FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        return row is not None
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached bodies"""
+        return self._size
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        row = self._db.execute(
+            """SELECT url, status_code, encoding, content_type, etag,
+            last_modified, content FROM responses WHERE url = ?""",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        self._accessed[url] = time.time_ns()
+        if len(self._accessed) >= self.access_batch:
+            self._write_accessed()
+            self._db.commit()
+        return CacheEntry(*row)
+
+    def _write_accessed(self) -> None:
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE responses SET accessed = ? WHERE url = ?",
+                [(accessed, url) for url, accessed in self._accessed.items()],
+            )
+            self._accessed = {}
+
+    def store(
+        self,
+        url: str,
+        response: HttpResponse,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Caches a complete response that can be revalidated"""
+        if response.truncated or not (etag or last_modified):
+            return
+        content = response.content or b""
+        self._accessed.pop(url, None)
+        replaced = self._db.execute(
+            "SELECT size FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        if replaced is None:
+            self._count += 1
+        else:
+            self._size -= replaced[0]
+        self._size += len(content)
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                url,
+                response.status_code,
+                response.encoding,
+                response.content_type,
+                etag,
+                last_modified,
+                content,
+                len(content),
+                time.time_ns(),
+            ),
+        )
+        self._evict()
+        self._db.commit()
+
+    def _over_limit(self) -> bool:
+        return (self.max_entries is not None and self._count > self.max_entries) or (
+            self.max_bytes is not None and self._size > self.max_bytes
+        )
+
+    def _evict(self) -> None:
+        """Deletes the least recently used entries while over a limit"""
+        if not self._over_limit():
+            return
+        self._write_accessed()
+        while self._over_limit():
+            rows = self._db.execute(
+                "SELECT url, size FROM responses ORDER BY accessed LIMIT 50"
+            ).fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                if not self._over_limit():
+                    break
+                self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._count -= 1
+                self._size -= size
+
+    def close(self) -> None:
+        self._write_accessed()
+        self._db.commit()
+        self._db.close()
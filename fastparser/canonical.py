@@ -0,0 +1,110 @@
+import posixpath
+import re
+import string
+from typing import Optional, Iterable
+from urllib.parse import quote, urlsplit, urlunsplit, parse_qsl, urlencode
+
+from .utilities import _URL
+
+
+_UNRESERVED = set(string.ascii_letters + string.digits + "-._~")
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+# characters that are left alone when quoting a path
+_PATH_SAFE = "/%:@!$&'()*+,;=-._~"
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+# host (a bracketed IPv6 address or a name) and an optional port
+_HOST_PORT = re.compile(r"^(\[[^\]]*\]|[^:]*)(?::(.*))?$")
+
+
+def _normalize_escapes(value: str) -> str:
+    """Unescapes unreserved characters and uppercases the other escapes"""
+
+    def replace(match):
+        char = chr(int(match.group(1), 16))
+        if char in _UNRESERVED:
+            return char
+        return "%" + match.group(1).upper()
+
+    return _ESCAPE.sub(replace, quote(value, safe=_PATH_SAFE))
+
+
+class UrlCanonicalizer:
+    """Rewrites urls to one canonical form, so variants share a sitemap entry
+
+    Hosts and schemes are lowercased, default ports and fragments dropped,
+    dot segments and double slashes in the path resolved and percent
+    escapes normalized.
+
+    :param scheme: scheme every url gets, e.g. "https" to merge http urls
+    :param index_pages: last path segments that are dropped
+    :param trailing_slash: "strip", "add" or "keep" the trailing slash
+    :param allowed_params: query params that are kept (sorted), e.g.
+        ["page"] for pagination. Without it the query is dropped
+    """
+
+    def __init__(
+        self,
+        scheme: Optional[str] = None,
+        index_pages: Iterable[str] = ("index.html", "index.htm", "index.php"),
+        trailing_slash: str = "strip",
+        allowed_params: Optional[Iterable[str]] = None,
+    ) -> None:
+        if trailing_slash not in ("strip", "add", "keep"):
+            raise ValueError("trailing_slash must be strip, add or keep")
+        self.scheme = scheme
+        self.index_pages = set(index_pages)
+        self.trailing_slash = trailing_slash
+        self.allowed_params = set(allowed_params) if allowed_params else set()
+
+    def __call__(self, url: _URL) -> _URL:
+        return self.canonicalize(url)
+
+    def canonicalize(self, url: _URL) -> _URL:
+        """Canonical form of url, urls that cannot be parsed are returned as is"""
+        try:
+            parsed = urlsplit(url)
+        except ValueError:
+            return url
+        scheme = (self.scheme or parsed.scheme).lower()
+
+        userinfo, _, hostport = parsed.netloc.rpartition("@")
+        match = _HOST_PORT.match(hostport.lower())
+        if match is None:
+            return url
+        host, port = match.group(1).rstrip("."), match.group(2)
+        if port and not port.isdigit():
+            return url
+        if port and port != _DEFAULT_PORTS.get(parsed.scheme.lower()):
+            host = f"{host}:{port}"
+        netloc = host
+        username = userinfo.partition(":")[0]
+        if username:
+            netloc = f"{username}@{host}"
+
+        return urlunsplit(
+            (scheme, netloc, self._path(parsed.path), self._query(parsed.query), "")
+        )
+
+    def _path(self, path: str) -> str:
+        trailing = path.endswith("/")
+        segments = [s for s in posixpath.normpath("/" + path).split("/") if s]
+        if segments and segments[-1] in self.index_pages:
+            segments.pop()
+            trailing = True
+
+        path = _normalize_escapes("/" + "/".join(segments))
+        if self.trailing_slash == "strip":
+            return path.rstrip("/")
+        if (self.trailing_slash == "add" or trailing) and not path.endswith("/"):
+            path += "/"
+        return path
+
+    def _query(self, query: str) -> str:
+        if not self.allowed_params or not query:
+            return ""
+        params = [
+            (key, value)
+            for key, value in parse_qsl(query, keep_blank_values=True)
+            if key in self.allowed_params
+        ]
+        return urlencode(sorted(params))
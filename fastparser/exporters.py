@@ -0,0 +1,226 @@
+import atexit
+import csv
+import gzip
+import io
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, List, IO, Sequence
+
+from .serialize import dumps, dumps_lines
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    from pyarrow import parquet
+except ImportError:
+    pyarrow = None
+
+
+class Exporter(ABC):
+    """Buffers exported records and writes them in batches off the event loop
+
+    A batch is written when flush_size records are buffered, or when a
+    record comes in flush_interval seconds after the last write. The
+    batches are written in order by one background thread. close (or
+    leaving the with block) writes the rest, an exporter that is still
+    open when the interpreter exits is closed then.
+
+    Subclasses implement write_batch for their format.
+
+    :param path: file the batches are appended to
+    :param flush_size: number of buffered records that triggers a write
+    :param flush_interval: max number of seconds records are buffered while
+        new records come in
+    :param compression: None, "gzip" or "zstd" (needs zstandard)
+    """
+
+    compressions = (None, "gzip", "zstd")
+
+    def __init__(
+        self,
+        path: str,
+        flush_size: int = 500,
+        flush_interval: float = 5.0,
+        compression: Optional[str] = None,
+    ) -> None:
+        if compression not in self.compressions:
+            raise ValueError(f"compression must be one of {self.compressions}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression needs the zstandard package")
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.compression = compression
+        self._buffer: List[Dict] = []
+        self._last_flush = time.monotonic()
+        self._error: Optional[BaseException] = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._closed = False
+        atexit.register(self.close)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, record: Dict) -> None:
+        """Buffers a record, e.g. SitemapItem.to_dict()"""
+        if self._closed:
+            raise ValueError("the exporter is closed")
+        self._buffer.append(record)
+        if (
+            len(self._buffer) >= self.flush_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush(wait=False)
+
+    def flush(self, wait: bool = True) -> Future:
+        """Writes the buffered records
+
+        :param wait: block until the batch is written. Without it the
+            returned Future can be awaited with asyncio.wrap_future
+        """
+        if self._closed:
+            raise ValueError("the exporter is closed")
+        if self._error is not None:
+            raise self._error
+        batch, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        future = self._executor.submit(self._run, batch)
+        if wait:
+            future.result()
+        return future
+
+    def close(self) -> None:
+        """Writes the rest and finishes the file
+
+        The last batch is written on the calling thread, the writer thread
+        no longer takes work once the interpreter is exiting.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._executor.shutdown(wait=True)
+        if self._error is not None:
+            raise self._error
+        batch, self._buffer = self._buffer, []
+        self._run(batch)
+        self.finish()
+
+    def _run(self, batch: List[Dict]) -> None:
+        try:
+            if batch:
+                self.write_batch(batch)
+        except BaseException as e:
+            self._error = e
+            raise
+
+    @abstractmethod
+    def write_batch(self, batch: List[Dict]) -> None:
+        """Writes a batch of records to path"""
+
+    def finish(self) -> None:
+        """Called once the last batch is written"""
+        pass
+
+    def open(self) -> IO[bytes]:
+        """Opens path for appending, through the compressor if there is one"""
+        if self.compression == "gzip":
+            return gzip.open(self.path, "ab")
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().stream_writer(open(self.path, "ab"))
+        return open(self.path, "ab")
+
+
+class JsonLinesExporter(Exporter):
+    """Writes one JSON object per line"""
+
+    def write_batch(self, batch: List[Dict]) -> None:
+        with self.open() as export_file:
+            export_file.write(dumps_lines(batch))
+
+
+def _flat_value(value):
+    """Lists and dicts do not fit in a column, they are stored as JSON"""
+    if isinstance(value, (dict, list, tuple)):
+        return dumps(value).decode("utf-8")
+    return value
+
+
+class CsvExporter(Exporter):
+    """Writes the records as CSV rows
+
+    The columns are fields, or the keys of the first batch. Keys that are
+    not a column are left out, lists and dicts are written as JSON. The
+    header is only written to a new file.
+
+    :param fields: the columns
+    """
+
+    def __init__(
+        self, path: str, fields: Optional[Sequence[str]] = None, **kwargs
+    ) -> None:
+        super().__init__(path, **kwargs)
+        self.fields = list(fields) if fields else None
+
+    def write_batch(self, batch: List[Dict]) -> None:
+        write_header = not os.path.isfile(self.path)
+        if self.fields is None:
+            self.fields = list(dict.fromkeys(key for record in batch for key in record))
+
+        rows = io.StringIO()
+        writer = csv.DictWriter(rows, fieldnames=self.fields, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        for record in batch:
+            writer.writerow({key: _flat_value(value) for key, value in record.items()})
+
+        with self.open() as export_file:
+            export_file.write(rows.getvalue().encode("utf-8"))
+
+
+class ParquetExporter(Exporter):
+    """Writes every batch as a row group of a Parquet file, needs pyarrow
+
+    The schema comes from the first batch, lists and dicts are stored as
+    JSON. Parquet files cannot be appended to, an existing file is
+    replaced. The compression is done by Parquet itself.
+    """
+
+    def __init__(self, path: str, **kwargs) -> None:
+        if pyarrow is None:
+            raise ImportError("ParquetExporter needs the pyarrow package")
+        compression = kwargs.pop("compression", None)
+        super().__init__(path, **kwargs)
+        self.parquet_compression = compression or "none"
+        self._writer = None
+
+    def write_batch(self, batch: List[Dict]) -> None:
+        rows = [
+            {key: _flat_value(value) for key, value in record.items()}
+            for record in batch
+        ]
+        if self._writer is None:
+            table = pyarrow.Table.from_pylist(rows)
+            self._writer = parquet.ParquetWriter(
+                self.path, table.schema, compression=self.parquet_compression
+            )
+        else:
+            table = pyarrow.Table.from_pylist(rows, schema=self._writer.schema)
+        self._writer.write_table(table)
+
+    def finish(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
@@ -0,0 +1,89 @@
+import heapq
+import itertools
+from typing import Optional, List, Tuple, Any
+
+
+class Frontier:
+    """Depth ordered queue of pending SitemapItems
+
+    Items are ordered by depth, then by rank (highest first) and then by
+    insertion order, so the crawl stays breadth first. Visited and
+    re-prioritised items are not removed from the heap directly, they are
+    skipped when they reach the top.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[int, float, int, Any]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __bool__(self) -> bool:
+        return self.peek() is not None
+
+    def push(self, item) -> None:
+        """Adds an unvisited item, or re-adds it after its depth or rank changed"""
+        if item.status_code is not None:
+            return
+        item._frontier = self
+        heapq.heappush(self._heap, (item.depth, -item.rank, next(self._counter), item))
+
+    def peek(self, max_depth: Optional[int] = None):
+        """Returns the next pending item without taking it off the queue
+
+        :param max_depth: items deeper than max_depth are not returned
+        """
+        heap = self._heap
+        while heap:
+            depth, rank, _, item = heap[0]
+            if (
+                item.status_code is not None
+                or item._frontier is not self
+                or depth != item.depth
+                or -rank != item.rank
+            ):
+                heapq.heappop(heap)
+                continue
+            if max_depth and depth > max_depth:
+                return None
+            return item
+        return None
+
+    def pop(self, max_depth: Optional[int] = None):
+        """Takes the next pending item off the queue
+
+        A popped item is detached from the frontier, lowering its depth or
+        changing its rank will not queue it again.
+        """
+        item = self.peek(max_depth)
+        if item is not None:
+            heapq.heappop(self._heap)
+            item._frontier = None
+        return item
+
+
+class Sitemap(dict):
+    """Dict of url: SitemapItem that keeps a Frontier of the unvisited items"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.frontier = Frontier()
+        super().__init__()
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, url: str, item) -> None:
+        replaced = self.get(url)
+        if replaced is not None and replaced is not item:
+            # its heap entries are skipped from now on
+            replaced._frontier = None
+        super().__setitem__(url, item)
+        self.frontier.push(item)
+
+    def update(self, *args, **kwargs) -> None:
+        for url, item in dict(*args, **kwargs).items():
+            self[url] = item
+
+    def setdefault(self, url: str, item=None):
+        if url not in self:
+            self[url] = item
+        return self[url]
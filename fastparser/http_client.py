@@ -1,102 +1,367 @@
 import asyncio
 import json
-from typing import Optional, List, Dict, Union
-from dataclasses import dataclass
+import socket
+import time
+from typing import Optional, List, Dict, Union, Sequence, TYPE_CHECKING
+from dataclasses import dataclass, field
 
 import aiohttp
 
 from .utilities import make_absolute, get_domain
 from .errors import TerminalError, NonTerminalError
+from .ratelimit import HostRateLimiter, limit, parse_retry_after
+from .retry import Attempt, RetryPolicy
 
+if TYPE_CHECKING:
+    from .cache import ResponseCache
+    from .transport import ArchiveTransport
 
-@dataclass
+
+@dataclass(init=False)
 class HttpResponse:
+    """Response with the body as bytes
+
+    text is decoded from content with encoding on first access and cached,
+    bodies that do not decode give an empty string. truncated is set when
+    the body was cut off at max_bytes or skipped for its content type.
+    attempts holds the timing of every request made for the response.
+    from_cache is set when the body was served from a ResponseCache.
+    """
+
     url: Optional[str] = None
     encoding: Optional[str] = None
     redirect: Optional[str] = None
     status_code: Optional[int] = None
-    text: Optional[str] = None
     content: Optional[bytes] = None
+    content_type: Optional[str] = None
+    truncated: bool = False
+    attempts: List[Attempt] = field(default_factory=list)
+    from_cache: bool = False
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        encoding: Optional[str] = None,
+        redirect: Optional[str] = None,
+        status_code: Optional[int] = None,
+        text: Optional[str] = None,
+        content: Optional[bytes] = None,
+        content_type: Optional[str] = None,
+        truncated: bool = False,
+        attempts: Optional[List[Attempt]] = None,
+        from_cache: bool = False,
+    ):
+        self.url = url
+        self.encoding = encoding
+        self.redirect = redirect
+        self.status_code = status_code
+        self.content = content
+        self.content_type = content_type
+        self.truncated = truncated
+        self.attempts = attempts if attempts is not None else []
+        self.from_cache = from_cache
+        self._text = text
+
+    @property
+    def text(self) -> Optional[str]:
+        if self._text is None and self.content is not None:
+            # the byte cap can cut the last character in half
+            errors = "ignore" if self.truncated else "strict"
+            try:
+                self._text = self.content.decode(self.encoding or "utf-8", errors)
+            except (UnicodeDecodeError, LookupError):
+                self._text = ""
+        return self._text
+
+
+def create_connector(
+    limit: int = 100,
+    limit_per_host: int = 0,
+    ttl_dns_cache: Optional[int] = 10,
+    keepalive_timeout: float = 15.0,
+    ipv4_only: bool = False,
+    happy_eyeballs_delay: Optional[float] = None,
+) -> aiohttp.TCPConnector:
+    """Creates a TCPConnector for a (shared) ClientSession
+
+    :param limit: max open connections in total, 0 is unlimited
+    :param limit_per_host: max open connections per host, 0 is unlimited
+    :param ttl_dns_cache: seconds DNS lookups are cached, None caches forever
+    :param keepalive_timeout: seconds an idle connection is kept open
+    :param ipv4_only: only connect over IPv4
+    :param happy_eyeballs_delay: seconds before the next address is tried
+        when connecting (needs aiohttp 3.10 or newer)
+    """
+    connector_args = {
+        "limit": limit,
+        "limit_per_host": limit_per_host,
+        "ttl_dns_cache": ttl_dns_cache,
+        "keepalive_timeout": keepalive_timeout,
+        "family": socket.AF_INET if ipv4_only else 0,
+    }
+    if happy_eyeballs_delay is not None:
+        connector_args["happy_eyeballs_delay"] = happy_eyeballs_delay
+    return aiohttp.TCPConnector(**connector_args)
 
 
 class HttpClient:
+    """Async HTTP client
+
+    Connection pooling is set with the create_connector options. Pass a
+    session to share one ClientSession, and its pool, between clients; a
+    shared session is not closed by the client, and the timeout and headers
+    of the client are sent with every request instead.
+
+    With max_bytes the body is streamed and cut off after max_bytes, a
+    larger Content-Length is not read at all. With content_types only
+    bodies of those types ("text/html", or "text/*") are read. Both give a
+    truncated response instead of an error, and can be set per request.
+
+    Failed requests are retried with the backoff of retry_policy, which
+    defaults to a RetryPolicy with the given number of retries.
+
+    With a ResponseCache cached urls are revalidated with a conditional
+    request, a 304 gives the cached response.
+
+    An ArchiveTransport records every response, or replays recorded
+    responses without touching the network.
+    """
+
     def __init__(
         self,
         proxy: Optional[str] = None,
         timeout: int = 15,
         retries: int = 5,
         headers: Dict = {},
+        rate_limiter: Optional[HostRateLimiter] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        ttl_dns_cache: Optional[int] = 10,
+        keepalive_timeout: float = 15.0,
+        ipv4_only: bool = False,
+        happy_eyeballs_delay: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        content_types: Optional[Sequence[str]] = None,
+        chunk_size: int = 64 * 1024,
+        retry_policy: Optional[RetryPolicy] = None,
+        cache: Optional["ResponseCache"] = None,
+        transport: Optional["ArchiveTransport"] = None,
     ):
         self.proxy = proxy
         timeout = aiohttp.ClientTimeout(total=timeout)
         self.headers = headers
-        self._client = aiohttp.ClientSession(timeout=timeout, headers=headers)
+        self.max_bytes = max_bytes
+        self.content_types = content_types
+        self.chunk_size = chunk_size
+        self._request_args = {}
+        if session is None:
+            connector = create_connector(
+                limit=limit,
+                limit_per_host=limit_per_host,
+                ttl_dns_cache=ttl_dns_cache,
+                keepalive_timeout=keepalive_timeout,
+                ipv4_only=ipv4_only,
+                happy_eyeballs_delay=happy_eyeballs_delay,
+            )
+            self._client = aiohttp.ClientSession(
+                timeout=timeout, headers=headers, connector=connector
+            )
+            self._owns_session = True
+        else:
+            self._client = session
+            self._owns_session = False
+            self._request_args["timeout"] = timeout
+            if headers:
+                self._request_args["headers"] = headers
         self.retries = retries
         self.proxy = proxy
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy(retries=retries)
+        self.cache = cache
+        self.transport = transport
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
-        await self._client.close()
-        await asyncio.sleep(0.250)
+        if self._owns_session:
+            await self._client.close()
+            await asyncio.sleep(0.250)
 
     async def get(
-        self, url: str, retries: Optional[int] = None, allow_redirects: bool = False
+        self,
+        url: str,
+        retries: Optional[int] = None,
+        allow_redirects: bool = False,
+        max_bytes: Optional[int] = None,
+        content_types: Optional[Sequence[str]] = None,
     ):
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        if content_types is None:
+            content_types = self.content_types
+        if self.transport is not None and self.transport.replaying:
+            return self.transport.replay("http", url)
+
         request_args = {"url": url, "allow_redirects": allow_redirects}
+        request_args.update(self._request_args)
         if self.proxy:
             request_args["proxy"] = self.proxy
-        if retries is None:
-            retries = self.retries
-        try:
-            async with self._client.get(**request_args) as resp:
-                try:
-                    text = await resp.text()
-                except UnicodeDecodeError:
-                    text = ""
-                content = await resp.read()
-                return await self._create_response(resp, text, content)
-        except aiohttp.client_exceptions.ServerDisconnectedError:
-            if retries > 0:
-                retries -= 1
-                return await self.get(url, retries)
-        except aiohttp.InvalidURL:
-            # return None and continue the program
-            return None
-        except aiohttp.ClientProxyConnectionError as e:
-            raise TerminalError("Proxy error is raised")
-        except aiohttp.ClientSSLError as e:
-            raise NonTerminalError(f"SSL error. Url: {url}")
-        except asyncio.exceptions.TimeoutError:
-            if retries > 0:
-                retries -= 1
-                return await self.get(url, retries)
-            else:
-                raise NonTerminalError(f"ServerTimeout at: {url}")
-        except aiohttp.ClientError as e:
-            raise TerminalError("Client error is raised")
+
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached and cached.validators:
+            request_args["headers"] = {
+                **request_args.get("headers", {}),
+                **cached.validators,
+            }
+
+        policy = self.retry_policy
+        if policy.budget is not None:
+            policy.budget.record_request()
+        attempts: List[Attempt] = []
+        retry = 0
+        while True:
+            response = None
+            error = None
+            headers = {}
+            start = time.monotonic()
+            try:
+                async with limit(self.rate_limiter, url):
+                    async with self._client.get(**request_args) as resp:
+                        headers = resp.headers
+                        if self.rate_limiter:
+                            self.rate_limiter.feedback(
+                                url, resp.status, headers.get("Retry-After")
+                            )
+                        response = await self._read_response(
+                            resp, max_bytes, content_types
+                        )
+            except aiohttp.client_exceptions.ServerDisconnectedError as e:
+                error = e
+            except aiohttp.InvalidURL:
+                # return None and continue the program
+                return None
+            except aiohttp.ClientProxyConnectionError as e:
+                raise TerminalError("Proxy error is raised")
+            except aiohttp.ClientSSLError as e:
+                raise NonTerminalError(f"SSL error. Url: {url}")
+            except asyncio.exceptions.TimeoutError as e:
+                error = e
+            except aiohttp.ClientError as e:
+                raise TerminalError("Client error is raised")
+
+            attempt = Attempt(
+                number=retry,
+                elapsed=time.monotonic() - start,
+                status_code=response.status_code if response else None,
+                error=type(error).__name__ if error else None,
+            )
+            attempts.append(attempt)
+
+            if response and response.status_code not in policy.retry_statuses:
+                break
+            if not policy.allow_retry(retry, retries):
+                break
+
+            attempt.delay = policy.delay(
+                retry, parse_retry_after(headers.get("Retry-After"))
+            )
+            await asyncio.sleep(attempt.delay)
+            retry += 1
+
+        if response is not None:
+            if cached and response.status_code == 304:
+                response = cached.response()
+            elif self.cache is not None and response.status_code == 200:
+                self.cache.store(
+                    url, response, headers.get("ETag"), headers.get("Last-Modified")
+                )
+            response.attempts = attempts
+            if self.transport is not None:
+                self.transport.record("http", url, response)
+            return response
+        if isinstance(error, asyncio.exceptions.TimeoutError):
+            raise NonTerminalError(f"ServerTimeout at: {url}")
+        # retries for disconnects ran out
+        return None
+
+    async def _read_response(
+        self,
+        resp,
+        max_bytes: Optional[int],
+        content_types: Optional[Sequence[str]],
+    ) -> HttpResponse:
+        if content_types and not allowed_content_type(resp, content_types):
+            return await self._create_response(resp, b"", truncated=True)
+
+        if max_bytes is None:
+            content = await resp.read()
+            return await self._create_response(resp, content)
+
+        if resp.content_length is not None and resp.content_length > max_bytes:
+            return await self._create_response(resp, b"", truncated=True)
+
+        chunks = []
+        size = 0
+        truncated = False
+        async for chunk in resp.content.iter_chunked(self.chunk_size):
+            if size + len(chunk) > max_bytes:
+                # leaving the body unread closes the connection
+                chunks.append(chunk[: max_bytes - size])
+                truncated = True
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+
+        return await self._create_response(
+            resp, b"".join(chunks), truncated=truncated, streamed=True
+        )
 
     @staticmethod
-    async def _create_response(resp, text: str, content: bytes) -> HttpResponse:
+    async def _create_response(
+        resp, content: bytes, truncated: bool = False, streamed: bool = False
+    ) -> HttpResponse:
         status = resp.status
         url = str(resp.url)
-        if 300 < status < 320:
+        if 300 < status < 320 and "location" in resp.headers:
             redirect = make_absolute(resp.headers["location"], get_domain(url))
             print(redirect)
         else:
             redirect = None
-        encoding = resp.get_encoding()
+        if streamed or truncated:
+            # the fallback encoding can only be detected from a read() body
+            encoding = resp.charset
+        else:
+            encoding = resp.get_encoding()
         return HttpResponse(
             url=url,
             encoding=encoding,
             redirect=redirect,
             status_code=status,
-            text=text,
             content=content,
+            content_type=resp.content_type if "Content-Type" in resp.headers else None,
+            truncated=truncated,
         )
 
 
+def allowed_content_type(resp, content_types: Sequence[str]) -> bool:
+    """Checks the Content-Type header against types like text/html or text/*
+
+    Responses without a Content-Type are allowed.
+    """
+    if not resp.headers.get("Content-Type"):
+        return True
+    content_type = resp.content_type
+    for allowed in content_types:
+        if allowed.endswith("/*"):
+            if content_type.startswith(allowed[:-1]):
+                return True
+        elif content_type == allowed:
+            return True
+    return False
+
+
 LUA_SRC = """function main(splash, args)
   splash:set_user_agent("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36")
   assert(splash:go(args.url))
@@ -116,17 +381,30 @@ class SplashClient:
         timeout: int = 15,
         retries: int = 3,
         splash_url: str = "http://localhost:8050/execute",
+        rate_limiter: Optional[HostRateLimiter] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        transport: Optional["ArchiveTransport"] = None,
     ):
         self.proxy = proxy
         timeout = aiohttp.ClientTimeout(total=timeout)
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"
         }
-        self._client = aiohttp.ClientSession(timeout=timeout, headers=headers)
+        self._request_args = {}
+        if session is None:
+            self._client = aiohttp.ClientSession(timeout=timeout, headers=headers)
+            self._owns_session = True
+        else:
+            self._client = session
+            self._owns_session = False
+            self._request_args = {"timeout": timeout, "headers": headers}
         self.retries = retries
         self.splash_url = splash_url
         self.splash_script = LUA_SRC
         self.proxy = proxy
+        # limits the crawled hosts, not the splash server
+        self.rate_limiter = rate_limiter
+        self.transport = transport
 
     async def __aenter__(
         self,
@@ -134,10 +412,14 @@ class SplashClient:
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
-        await self._client.close()
-        await asyncio.sleep(0.250)
+        if self._owns_session:
+            await self._client.close()
+            await asyncio.sleep(0.250)
 
     async def get(self, url: str, retries: Optional[int] = None) -> HttpResponse:
+        if self.transport is not None and self.transport.replaying:
+            return self.transport.replay("splash", url)
+
         data = {
             "lua_source": self.splash_script,
             "url": url,
@@ -152,9 +434,17 @@ class SplashClient:
             tries = self.retries
 
         try:
-            async with self._client.post(self.splash_url, json=data) as resp:
-                text = await resp.text()
-                return self.http_response(text, url)
+            async with limit(self.rate_limiter, url):
+                async with self._client.post(
+                    self.splash_url, json=data, **self._request_args
+                ) as resp:
+                    text = await resp.text()
+                    response = self.http_response(text, url)
+                    if self.rate_limiter:
+                        self.rate_limiter.feedback(url, response.status_code)
+                    if self.transport is not None:
+                        self.transport.record("splash", url, response)
+                    return response
 
         except Exception as e:
             print(e)
@@ -184,6 +474,7 @@ class SplashClient:
             status_code=status_code,
             text=text,
             content=content,
+            encoding="utf-8",
             redirect=redirect,
             url=url,
         )
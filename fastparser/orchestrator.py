@@ -0,0 +1,94 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Iterable, Callable
+
+from .base_site import BaseSite
+from .errors import NonTerminalError
+from .utilities import _URL
+
+
+@dataclass
+class CrawlReport:
+    """Aggregate result of a multi-site crawl"""
+
+    sites: List[BaseSite] = field(default_factory=list)
+    skipped: Dict[_URL, str] = field(default_factory=dict)
+    pages: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def pages_per_sec(self) -> float:
+        if not self.elapsed:
+            return 0.0
+        return self.pages / self.elapsed
+
+
+class CrawlOrchestrator:
+    """Crawls many sites at once over one shared client
+
+    :param client: HttpClient (or SplashClient) shared by all sites
+    :param max_sites: number of sites crawled at the same time
+    :param site_class: BaseSite subclass created for every root url
+    :param site_kwargs: extra keyword arguments for site_class
+
+    A NonTerminalError (or an invalid root url) skips the domain, a
+    TerminalError cancels the sites in progress and is raised.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_sites: int = 10,
+        site_class: Callable[..., BaseSite] = BaseSite,
+        site_kwargs: Optional[Dict] = None,
+    ) -> None:
+        if max_sites < 1:
+            raise ValueError("max_sites must be at least 1")
+        self.client = client
+        self.max_sites = max_sites
+        self.site_class = site_class
+        self.site_kwargs = site_kwargs or {}
+
+    async def crawl_site(self, site: BaseSite, func=None, **kwargs) -> None:
+        """Crawls one site, with run_site when func is given else build_site"""
+        if func is None:
+            await site.build_site(self.client, **kwargs)
+        else:
+            await site.run_site(self.client, func, **kwargs)
+
+    async def run(self, urls: Iterable[_URL], func=None, **kwargs) -> CrawlReport:
+        """Crawls all urls, keyword arguments go to run_site or build_site"""
+        report = CrawlReport()
+        urls = iter(urls)
+        start = time.monotonic()
+
+        async def worker():
+            for url in urls:
+                try:
+                    site = self.site_class(url, **self.site_kwargs)
+                except ValueError as e:
+                    report.skipped[url] = str(e)
+                    continue
+
+                try:
+                    await self.crawl_site(site, func, **kwargs)
+                except NonTerminalError as e:
+                    report.skipped[url] = str(e)
+                else:
+                    report.sites.append(site)
+                finally:
+                    report.pages += site.pages_visited
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.max_sites)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        finally:
+            report.elapsed = time.monotonic() - start
+
+        return report
@@ -0,0 +1,68 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Callable, Dict, Tuple
+
+from .base_parser import BasePage, PageSummary
+from .http_client import HttpResponse
+
+
+def parse_page(
+    content: bytes,
+    encoding: Optional[str],
+    url: str,
+    extract: Optional[Callable[[BasePage], Dict]] = None,
+    truncated: bool = False,
+) -> Tuple[PageSummary, Dict]:
+    """Parses a page and returns its summary and the extracted data
+
+    Runs in the worker processes, so extract has to be a module level
+    function.
+    """
+    text = HttpResponse(
+        url=url, encoding=encoding, content=content, truncated=truncated
+    ).text
+    page = BasePage(text, url)
+    data = extract(page) if extract is not None else {}
+    return page.summary(), data or {}
+
+
+class ParseExecutor:
+    """Parses pages in a pool of processes
+
+    Only the raw bytes go to the workers and only a PageSummary and the
+    dict returned by extract come back, so parsing and link resolution do
+    not block the event loop.
+
+    :param max_workers: number of processes, defaults to the number of cores
+    :param extract: module level function that gets the BasePage and
+        returns the data for SitemapItem.data
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        extract: Optional[Callable[[BasePage], Dict]] = None,
+    ) -> None:
+        self.extract = extract
+        self._pool = ProcessPoolExecutor(max_workers=max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    async def parse(self, response: HttpResponse) -> Tuple[PageSummary, Dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._pool,
+            parse_page,
+            response.content or b"",
+            response.encoding,
+            response.url,
+            self.extract,
+            response.truncated,
+        )
+
+    def shutdown(self) -> None:
+        self._pool.shutdown()
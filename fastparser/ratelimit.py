@@ -0,0 +1,128 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict
+from urllib.parse import urlparse
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header to a number of seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class _HostBucket:
+    def __init__(self, burst: int, max_in_flight: int) -> None:
+        self.tokens: float = burst
+        self.updated: float = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.backoff: float = 0.0
+        self.blocked_until: float = 0.0
+
+
+class HostRateLimiter:
+    """Token bucket rate limiter keyed by host
+
+    Every host gets its own bucket, so requests to different hosts never
+    wait on each other.
+
+    :param rate: requests per second per host
+    :param burst: number of requests that can be made at once after idling
+    :param max_in_flight: max concurrent requests per host
+    :param max_backoff: max seconds a host is paused after 429 or 503
+    """
+
+    backoff_statuses = (429, 503)
+
+    def __init__(
+        self,
+        rate: float = 2.0,
+        burst: int = 1,
+        max_in_flight: int = 2,
+        max_backoff: float = 60.0,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_backoff = max_backoff
+        self._buckets: Dict[str, _HostBucket] = {}
+
+    def _bucket(self, url: str) -> _HostBucket:
+        host = urlparse(url).netloc.lower()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = _HostBucket(self.burst, self.max_in_flight)
+            self._buckets[host] = bucket
+        return bucket
+
+    async def _take_token(self, bucket: _HostBucket) -> None:
+        async with bucket.lock:
+            while True:
+                now = time.monotonic()
+                if bucket.blocked_until > now:
+                    await asyncio.sleep(bucket.blocked_until - now)
+                    continue
+
+                bucket.tokens = min(
+                    self.burst, bucket.tokens + (now - bucket.updated) * self.rate
+                )
+                bucket.updated = now
+                if bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    return
+                await asyncio.sleep((1 - bucket.tokens) / self.rate)
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        """Waits for a free slot and a token for the host of url"""
+        bucket = self._bucket(url)
+        async with bucket.in_flight:
+            await self._take_token(bucket)
+            yield
+
+    def feedback(
+        self, url: str, status_code: Optional[int], retry_after: Optional[str] = None
+    ) -> None:
+        """Adapts the pace for a host to the response it gave
+
+        429 and 503 pause the host for Retry-After seconds, or for a backoff
+        that doubles on every throttled response. Other responses halve the
+        backoff again.
+        """
+        bucket = self._bucket(url)
+        if status_code in self.backoff_statuses:
+            delay = parse_retry_after(retry_after)
+            bucket.backoff = min(
+                max(bucket.backoff * 2, 1 / self.rate), self.max_backoff
+            )
+            if delay is None:
+                delay = bucket.backoff
+            bucket.blocked_until = time.monotonic() + min(delay, self.max_backoff)
+        elif bucket.backoff:
+            bucket.backoff /= 2
+            if bucket.backoff < 1 / self.rate:
+                bucket.backoff = 0.0
+
+
+@asynccontextmanager
+async def _no_limit():
+    yield
+
+
+def limit(rate_limiter: Optional[HostRateLimiter], url: str):
+    """Returns the rate limiter's context for url, or a no-op context"""
+    if rate_limiter is None:
+        return _no_limit()
+    return rate_limiter.limit(url)
@@ -0,0 +1,80 @@
+import random
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+
+@dataclass
+class Attempt:
+    """Timing of one request attempt
+
+    :param number: 0 for the first request, 1 for the first retry, ...
+    :param elapsed: seconds the attempt took
+    :param status_code: status of the response, None when error is set
+    :param error: name of the exception that ended the attempt
+    :param delay: seconds slept before the next attempt
+    """
+
+    number: int
+    elapsed: float
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    delay: float = 0.0
+
+
+class RetryBudget:
+    """Caps the share of requests that are retries
+
+    A retry is allowed while retries stay below min_retries plus ratio
+    times the number of requests. Share one budget between clients to cap
+    the retries of the whole crawl.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10) -> None:
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+
+    def record_request(self) -> None:
+        self.requests += 1
+
+    def withdraw(self) -> bool:
+        """Takes a retry from the budget, False when it is spent"""
+        if self.retries >= self.min_retries + self.ratio * self.requests:
+            return False
+        self.retries += 1
+        return True
+
+
+@dataclass
+class RetryPolicy:
+    """When and how long to wait before retrying a request
+
+    Timeouts, disconnects and retry_statuses are retried up to retries
+    times. The n-th retry waits backoff * 2 ** n seconds, capped at
+    max_backoff; with jitter the wait is a random share of that. A
+    Retry-After header is waited out when it is longer.
+    """
+
+    retries: int = 5
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    jitter: bool = True
+    retry_statuses: Tuple[int, ...] = (429, 502, 503, 504)
+    budget: Optional[RetryBudget] = field(default_factory=RetryBudget)
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** retry)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+    def allow_retry(self, retry: int, retries: Optional[int] = None) -> bool:
+        """Checks the retries left and takes a retry from the budget"""
+        if retries is None:
+            retries = self.retries
+        if retry >= retries:
+            return False
+        return self.budget is None or self.budget.withdraw()
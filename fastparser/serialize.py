@@ -0,0 +1,32 @@
+import json
+from typing import Any, Iterable, Dict, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON encodes obj to UTF-8 bytes, with orjson when it is installed
+
+    Values orjson does not handle (e.g. ints over 64 bits) go through the
+    stdlib json module.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def dumps_lines(records: Iterable[Dict]) -> bytes:
+    """JSON lines of a batch of records, one per line"""
+    return b"".join(dumps(record) + b"\n" for record in records)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,177 @@
+import asyncio
+import zlib
+from typing import Optional, List, NamedTuple, AsyncIterator
+
+from lxml import etree
+
+from .errors import NonTerminalError
+
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class SitemapEntry(NamedTuple):
+    """A <url> or <sitemap> element of a sitemap
+
+    :param kind: "url" for a page, "sitemap" for a sitemap of an index
+    """
+
+    kind: str
+    loc: str
+    lastmod: Optional[str] = None
+    priority: Optional[float] = None
+
+
+def _localname(tag) -> str:
+    if not isinstance(tag, str):
+        return ""
+    return tag.rpartition("}")[2]
+
+
+def _parse_priority(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class SitemapParser:
+    """Incremental parser of sitemap.xml and sitemap index files
+
+    Feed it the body in chunks, every call returns the entries that were
+    completed. Parsed elements are dropped right away, so memory does not
+    grow with the size of the sitemap. Gzipped sitemaps are decompressed
+    on the fly.
+    """
+
+    def __init__(self) -> None:
+        self._parser = etree.XMLPullParser(
+            events=("end",), recover=True, huge_tree=True, resolve_entities=False
+        )
+        self._decompressor = None
+        self._head = b""
+        self._started = False
+
+    def feed(self, data: bytes) -> List[SitemapEntry]:
+        if not self._started:
+            # the gzip magic is needed to pick a decoder
+            self._head += data
+            if len(self._head) < len(_GZIP_MAGIC):
+                return []
+            data, self._head = self._head, b""
+            self._started = True
+            if data.startswith(_GZIP_MAGIC):
+                self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data)
+        self._parser.feed(data)
+        return self._entries()
+
+    def close(self) -> List[SitemapEntry]:
+        if not self._started:
+            self._started = True
+            if self._head:
+                self._parser.feed(self._head)
+        elif self._decompressor is not None:
+            self._parser.feed(self._decompressor.flush())
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        return self._entries()
+
+    def _entries(self) -> List[SitemapEntry]:
+        entries = []
+        for _, elem in self._parser.read_events():
+            kind = _localname(elem.tag)
+            if kind not in ("url", "sitemap"):
+                continue
+
+            values = {_localname(child.tag): child.text for child in elem}
+            loc = (values.get("loc") or "").strip()
+            if loc:
+                lastmod = (values.get("lastmod") or "").strip() or None
+                priority = _parse_priority((values.get("priority") or "").strip())
+                entries.append(SitemapEntry(kind, loc, lastmod, priority))
+
+            # drop the element and the ones before it
+            elem.clear()
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+        return entries
+
+
+async def iter_sitemap(
+    url: str,
+    client,
+    max_concurrency: int = 4,
+    max_sitemaps: int = 1000,
+    chunk_size: int = 64 * 1024,
+) -> AsyncIterator[SitemapEntry]:
+    """Yields the page entries of a sitemap, following sitemap indexes
+
+    The sitemaps of an index are fetched max_concurrency at a time. Every
+    sitemap is fetched once and at most max_sitemaps are fetched. Sitemaps
+    of an index that fail with a NonTerminalError are skipped, errors of
+    the url itself are raised.
+
+    :param url: url of the sitemap or sitemap index
+    :param client: client with an async get(url) method
+    :param chunk_size: size of the chunks the bodies are parsed in
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    seen = {url}
+    tasks = set()
+    done = object()
+
+    async def handle(entry: SitemapEntry):
+        if entry.kind == "url":
+            await queue.put(entry)
+        elif entry.loc not in seen and len(seen) < max_sitemaps:
+            seen.add(entry.loc)
+            tasks.add(asyncio.ensure_future(fetch(entry.loc)))
+
+    async def fetch(sitemap_url: str):
+        try:
+            async with semaphore:
+                try:
+                    resp = await client.get(sitemap_url)
+                except NonTerminalError:
+                    if sitemap_url == url:
+                        raise
+                    return
+            if not resp or resp.status_code != 200 or not resp.content:
+                return
+
+            parser = SitemapParser()
+            content = resp.content
+            for start in range(0, len(content), chunk_size):
+                for entry in parser.feed(content[start : start + chunk_size]):
+                    await handle(entry)
+            for entry in parser.close():
+                await handle(entry)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(done)
+
+    tasks.add(asyncio.ensure_future(fetch(url)))
+    finished = 0
+    try:
+        # every fetch adds its children before it is done
+        while finished < len(tasks):
+            entry = await queue.get()
+            if entry is done:
+                finished += 1
+            elif isinstance(entry, Exception):
+                raise entry
+            else:
+                yield entry
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,125 @@
+import sqlite3
+from typing import Optional, Iterator, Iterable
+
+from .serialize import dumps, loads
+
+
+class ItemStore:
+    """SQLite store of SitemapItems without their pages
+
+    Writes are committed in batches of commit_every, call flush to commit
+    the rest.
+
+    :param path: path of the SQLite file
+    """
+
+    def __init__(self, path: str, commit_every: int = 500) -> None:
+        self.path = path
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS items (
+                url TEXT PRIMARY KEY,
+                query TEXT,
+                depth INTEGER,
+                status_code INTEGER,
+                redirect TEXT,
+                lastmod TEXT,
+                priority REAL,
+                fingerprint TEXT,
+                changes INTEGER,
+                data TEXT
+            )"""
+        )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def __contains__(self, url: str) -> bool:
+        row = self._db.execute("SELECT 1 FROM items WHERE url = ?", (url,)).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator:
+        for row in self._db.execute(f"SELECT {self._columns} FROM items"):
+            yield self._to_item(row)
+
+    _columns = (
+        "url, query, depth, status_code, redirect, lastmod, priority, "
+        "fingerprint, changes, data"
+    )
+
+    @staticmethod
+    def _to_row(item) -> tuple:
+        return (
+            item.url,
+            item.query,
+            item.depth,
+            item.status_code,
+            item.redirect,
+            item.lastmod,
+            item.priority,
+            item.fingerprint,
+            item.changes,
+            dumps(item.data),
+        )
+
+    @staticmethod
+    def _to_item(row):
+        from .base_site import SitemapItem
+
+        (
+            url,
+            query,
+            depth,
+            status_code,
+            redirect,
+            lastmod,
+            priority,
+            fingerprint,
+            changes,
+            data,
+        ) = row
+        item = SitemapItem(
+            depth,
+            url,
+            status_code=status_code,
+            redirect=redirect,
+            lastmod=lastmod,
+            priority=priority,
+        )
+        # the stored url can be canonical, keep it as it was
+        item.url = url
+        item.query = query
+        item.fingerprint = fingerprint
+        item.changes = changes or 0
+        item.data = loads(data)
+        return item
+
+    def get(self, url: str):
+        row = self._db.execute(
+            f"SELECT {self._columns} FROM items WHERE url = ?", (url,)
+        ).fetchone()
+        return self._to_item(row) if row else None
+
+    def put_many(self, items: Iterable) -> None:
+        rows = [self._to_row(item) for item in items]
+        self._db.executemany(
+            "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._uncommitted += len(rows)
+        if self._uncommitted >= self.commit_every:
+            self.flush()
+
+    def put(self, item) -> None:
+        self.put_many([item])
+
+    def flush(self) -> None:
+        self._db.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
@@ -0,0 +1,85 @@
+import sqlite3
+from typing import Optional
+
+from .errors import NonTerminalError
+from .http_client import HttpResponse
+
+
+class ArchiveTransport:
+    """Records responses to an SQLite archive, or replays them from it
+
+    In "record" mode the clients make real requests and store every
+    response. In "replay" mode no requests are made at all: responses come
+    from the archive and urls that were not recorded raise a
+    NonTerminalError.
+
+    :param path: path of the archive file
+    :param mode: "record" or "replay"
+    """
+
+    modes = ("record", "replay")
+
+    def __init__(self, path: str, mode: str = "replay") -> None:
+        if mode not in self.modes:
+            raise ValueError(f"mode must be one of {self.modes}")
+        self.path = path
+        self.mode = mode
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                namespace TEXT,
+                url TEXT,
+                status_code INTEGER,
+                encoding TEXT,
+                redirect TEXT,
+                content_type TEXT,
+                content BLOB,
+                PRIMARY KEY (namespace, url)
+            )"""
+        )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, namespace: str, url: str, response: HttpResponse) -> None:
+        """Stores response for url, namespace tells the client types apart"""
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                namespace,
+                url,
+                response.status_code,
+                response.encoding,
+                response.redirect,
+                response.content_type,
+                response.content,
+            ),
+        )
+        self._db.commit()
+
+    def replay(self, namespace: str, url: str) -> HttpResponse:
+        row = self._db.execute(
+            """SELECT status_code, encoding, redirect, content_type, content
+            FROM responses WHERE namespace = ? AND url = ?""",
+            (namespace, url),
+        ).fetchone()
+        if row is None:
+            raise NonTerminalError(f"Not in archive: {url}")
+
+        status_code, encoding, redirect, content_type, content = row
+        return HttpResponse(
+            url=url,
+            encoding=encoding,
+            redirect=redirect,
+            status_code=status_code,
+            content=content,
+            content_type=content_type,
+        )
+
+    def close(self) -> None:
+        self._db.close()
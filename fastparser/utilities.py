@@ -1,14 +1,31 @@
-from typing import Union, List
-from urllib.parse import urlparse, urlunparse, urljoin
+import hashlib
+import sys
+from functools import lru_cache
+from typing import Union, List, Any
+from urllib.parse import urlsplit, urlunsplit, urljoin, SplitResult
 from dataclasses import dataclass
 
 from fuzzywuzzy import fuzz
 
+try:
+    from rapidfuzz import fuzz as rapid_fuzz
+    from rapidfuzz import process as rapid_process
+except ImportError:
+    rapid_fuzz = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 # Typing
 _URL = str
 _CssSelector = str
 
+# Max number of urls and (link, base_url) pairs the url helpers remember
+URL_CACHE_SIZE = 8192
+
 
 @dataclass
 class FuzzyExtract:
@@ -16,38 +33,54 @@ class FuzzyExtract:
     score: int
 
 
+def approx_size(obj: Any) -> int:
+    """Rough memory size of strings, bytes and the dicts and lists of them"""
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(
+            approx_size(k) + approx_size(v) for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(approx_size(i) for i in obj)
+    return sys.getsizeof(obj)
+
+
+def fingerprint(content: bytes) -> str:
+    """Short hash of a page body, to tell whether it changed"""
+    return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def split_url(url: str) -> SplitResult:
+    """urlsplit with a bounded cache, for urls that are split over and over"""
+    return urlsplit(url)
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def get_domain(url: str) -> _URL:
     """gives back the domain of an url"""
-    parsed = urlparse(url)._asdict()
+    parsed = split_url(url)
 
-    if not parsed["netloc"]:
+    if not parsed.netloc:
         return
 
-    if not parsed["scheme"]:
-        parsed["scheme"] = "https"
-
-        parsed = (v for v in parsed.values())
-
-    return urlunparse((parsed["scheme"], parsed["netloc"], "", "", "", ""))
+    scheme = parsed.scheme or "https"
+    return urlunsplit((scheme, parsed.netloc, "", "", ""))
 
 
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def make_absolute(link: str, base_url: str) -> _URL:
     """Makes a given link absolute."""
 
     # Parse the link with stdlib.
-    parsed = urlparse(link)._asdict()
+    parsed = split_url(link)
 
     # If link is relative, then join it with base_url.
-    if not parsed["netloc"]:
+    if not parsed.netloc:
         return urljoin(base_url, link)
 
     # Link is absolute; if it lacks a scheme, add one from base_url.
-    if not parsed["scheme"]:
-        parsed["scheme"] = urlparse(base_url).scheme
-
-        # Reconstruct the URL to incorporate the new scheme.
-        parsed = (v for v in parsed.values())
-        return urlunparse(parsed)
+    if not parsed.scheme:
+        return urlunsplit(parsed._replace(scheme=split_url(base_url).scheme))
 
     # Link is absolute and complete with scheme; nothing to be done here.
     return link
@@ -69,6 +102,58 @@ def fuzzy_search(
     return FuzzyExtract(extract, highest_match)
 
 
+def fuzzy_search_batch(
+    to_match: Union[List[str], str],
+    search_lists: List[List[str]],
+    score_cutoff: int = 0,
+) -> List[FuzzyExtract]:
+    """fuzzy_search for many search lists at once, gives the best per list
+
+    With rapidfuzz and numpy installed all strings are scored in a single
+    cdist call, with only rapidfuzz in one call per string. Scores are
+    the same as fuzzywuzzy's ratio, scores below score_cutoff count as 0.
+    """
+    if isinstance(to_match, str):
+        to_match = [to_match]
+    if rapid_fuzz is None:
+        extracts = [fuzzy_search(to_match, search_list) for search_list in search_lists]
+        return [
+            extract if extract.score >= score_cutoff else FuzzyExtract("", 0)
+            for extract in extracts
+        ]
+
+    strings = [string for search_list in search_lists for string in search_list]
+    # rapidfuzz scores are floats, fuzzywuzzy rounds them
+    cutoff = max(score_cutoff - 0.5, 0)
+    if numpy is not None and strings and to_match:
+        matrix = rapid_process.cdist(
+            to_match, strings, scorer=rapid_fuzz.ratio, score_cutoff=cutoff
+        )
+        scores = matrix.max(axis=0).tolist()
+    else:
+        scores = [
+            max(
+                (rapid_fuzz.ratio(q, string, score_cutoff=cutoff) for q in to_match),
+                default=0,
+            )
+            for string in strings
+        ]
+
+    extracts = []
+    start = 0
+    for search_list in search_lists:
+        highest_match = 0
+        extract = ""
+        for string, score in zip(search_list, scores[start : start + len(search_list)]):
+            score = int(round(score))
+            if score > highest_match:
+                highest_match = score
+                extract = string
+        extracts.append(FuzzyExtract(extract, highest_match))
+        start += len(search_list)
+    return extracts
+
+
 # List of tags that are mostly used for inline html elements
 inline_elements = [
     "a",
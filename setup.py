@@ -26,4 +26,8 @@ setuptools.setup(
         "aiohttp",
         "python-Levenshtein",
     ],
+    extras_require={
+        "fast": ["rapidfuzz", "numpy", "orjson"],
+        "export": ["zstandard", "pyarrow"],
+    },
 )
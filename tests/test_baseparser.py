@@ -5,7 +5,9 @@ import pytest
 import pytest_check as check
 from selectolax.parser import HTMLParser
 
-from fastparser.utilities import make_absolute
+from fastparser import utilities
+from fastparser.utilities import make_absolute, fuzzy_search, fuzzy_search_batch
+from fastparser.utilities import get_domain
 from fastparser.base_parser import Ahref
 from fastparser.base_parser import BasePage
 
@@ -42,6 +44,38 @@ def test_make_absolute_external():
     assert absolute == "https://www.google.com/tester"
 
 
+def test_make_absolute_is_memoized():
+    make_absolute.cache_clear()
+    for _ in range(3):
+        make_absolute("/testers", "https://www.getevents.nl/asd/")
+    assert make_absolute.cache_info().hits == 2
+
+
+def test_get_domain():
+    assert get_domain("https://www.getevents.nl/ams/") == "https://www.getevents.nl"
+    assert get_domain("//www.getevents.nl/ams/") == "https://www.getevents.nl"
+    assert get_domain("/ams/") is None
+
+
+@pytest.mark.parametrize("backend", ["cdist", "rapidfuzz", "fuzzywuzzy"])
+def test_fuzzy_search_batch(monkeypatch, backend):
+    if backend != "cdist":
+        monkeypatch.setattr(utilities, "numpy", None)
+    if backend == "fuzzywuzzy":
+        monkeypatch.setattr(utilities, "rapid_fuzz", None)
+
+    page = BasePage(TEST_HTML_PAGE, TEST_HTML_URL)
+    search_lists = [link.path_split + [link.text_lower] for link in page.links]
+    search_lists.append([])
+    to_match = ["donate", "documentation", "events"]
+
+    extracts = fuzzy_search_batch(to_match, search_lists)
+    assert extracts == [fuzzy_search(to_match, strings) for strings in search_lists]
+
+    cut = fuzzy_search_batch(to_match, search_lists, score_cutoff=80)
+    assert [e.score >= 80 for e in cut] == [e.score >= 80 for e in extracts]
+
+
 def test_ahref_split():
     tree = HTMLParser(
         '<html><a href="https://www.google.com/tester/nog1/enq/">Google tester</a></html>'
@@ -57,6 +91,23 @@ def test_ahref_split():
     check.is_true(ahref.is_internal)
 
 
+def test_ahref_is_slotted():
+    tree = HTMLParser(
+        '<html><a href="/Tester/Nog1" class="nav">Google Tester</a>'
+        '<a href="/plain">Plain</a></html>'
+    )
+    base = "https://www.google.com/"
+    ahref, plain = [Ahref(node, base, "www.google.com") for node in tree.css("a")]
+
+    assert not hasattr(ahref, "__dict__")
+    check.equal(ahref.path_split, ["tester", "nog1"])
+    check.is_(ahref.path_split, ahref.path_split)
+    check.equal(ahref.text_lower, "google tester")
+    check.equal(ahref.attributes["class"], "nav")
+    check.equal(plain.attributes, {"href": "/plain"})
+    check.is_true(plain.is_internal)
+
+
 def test_relative_url():
     tree = HTMLParser('<html><a href="/test/relative">Testing</a></html>')
     href_node = tree.css_first("a")
@@ -115,6 +166,15 @@ def test_text():
     assert page.text == "Deze content moet bewaard blijven"
 
 
+def test_text_is_cached_without_html():
+    page = BasePage(TEST_HTML_PAGE, TEST_HTML_URL)
+    page.release_html()
+    text = page.text
+    assert "Python is a programming language" in text
+    assert "<script" not in text
+    assert page.text is text
+
+
 def test_css():
     url = "https://www.getevents.nl"
     html_string = """<html>
@@ -203,6 +263,17 @@ def test_external_links():
     check.is_true(page.external_links)
 
 
+def test_links_are_lazy():
+    page = BasePage(TEST_HTML_PAGE, TEST_HTML_URL)
+    assert page.css_first("title")
+    assert "links" not in page.__dict__
+
+    internal_links = page.internal_links
+    assert "links" in page.__dict__
+    assert page.internal_links is internal_links
+    assert len(internal_links) + len(page.external_links) == len(page.links)
+
+
 def test_find_in_ahref():
     page = BasePage(TEST_HTML_PAGE, TEST_HTML_URL)
     search_string = "learn more"
@@ -241,6 +312,26 @@ def test_find_in_ahref_text():
     assert links[0].href == "/doc/"
 
 
+def test_find_in_ahref_index_order():
+    html_string = """<html><body>
+    <a href="https://www.getevents.nl/uitje/">Extern uitje</a>
+    <a href="/uitje/amsterdam/">Amsterdam</a>
+    <a href="/utrecht/">Uitje</a>
+    <a href="/uitje/uitje/">Dubbel</a>
+    </body></html>"""
+    page = BasePage(html_string, "https://www.python.org/")
+    links = page.find_in_ahref("Uitje")
+    assert [link.href for link in links] == [
+        "/uitje/amsterdam/",
+        "/utrecht/",
+        "/uitje/uitje/",
+        "https://www.getevents.nl/uitje/",
+    ]
+    assert page.find_in_ahref("uitje", in_path=False, external=False)[0].href == (
+        "/utrecht/"
+    )
+
+
 def test_find_in_ahref_fuzzy():
     page = BasePage(TEST_HTML_PAGE, TEST_HTML_URL)
     search_string = "donate"
@@ -6,15 +6,43 @@ import pytest
 import pytest_check as check
 from selectolax.parser import HTMLParser
 
-from fastparser.http_client import HttpClient
+from fastparser.http_client import HttpClient, HttpResponse
 from fastparser.utilities import make_absolute
 from fastparser.base_parser import Ahref, BasePage
-from fastparser.base_site import BaseSite, SitemapItem
+from fastparser.base_site import BaseSite, SitemapItem, Retention
+from fastparser.exporters import JsonLinesExporter
+from fastparser.parse_pool import ParseExecutor, parse_page
 
 
 pytestmark = pytest.mark.asyncio
 
 
+class FakeClient:
+    """Serves a small site of linked pages without network access"""
+
+    def __init__(self, pages, delay=0.0):
+        self.pages = pages
+        self.delay = delay
+        self.requested = []
+
+    async def get(self, url):
+        self.requested.append(url)
+        await asyncio.sleep(self.delay)
+        links = "".join(f'<a href="{link}">{link}</a>' for link in self.pages[url])
+        html = f"<html><head><title>{url}</title></head><body>{links}</body></html>"
+        return HttpResponse(url=url, status_code=200, text=html, content=html.encode())
+
+
+FAKE_SITE = {
+    "https://www.getevents.nl": ["/a", "/b"],
+    "https://www.getevents.nl/a": ["/a1", "/a2"],
+    "https://www.getevents.nl/b": ["/b1"],
+    "https://www.getevents.nl/a1": [],
+    "https://www.getevents.nl/a2": ["/b"],
+    "https://www.getevents.nl/b1": ["/a"],
+}
+
+
 def test_create_sitemapitem():
     item = SitemapItem(depth=0, url="https://www.getevents.nl")
     assert item.path == ""
@@ -115,6 +143,36 @@ def test_get_unvitied_url_max_depth():
     assert get_item2 is None
 
 
+def test_get_unvisited_item_breadth_first():
+    site = BaseSite("https://www.getevents.nl")
+    site.sitemap["https://www.getevents.nl"].status_code = 200
+    deep = SitemapItem(2, "https://www.getevents.nl/amsterdam/avond")
+    first = SitemapItem(1, "https://www.getevents.nl/amsterdam")
+    second = SitemapItem(1, "https://www.getevents.nl/utrecht")
+    for item in [deep, first, second]:
+        site.item_to_sitemap(item)
+
+    assert site.get_unvisited_item() is first
+    first.status_code = 200
+    assert site.get_unvisited_item() is second
+    second.status_code = 200
+    assert site.get_unvisited_item() is deep
+
+
+def test_lower_depth_reprioritises_item():
+    site = BaseSite("https://www.getevents.nl")
+    site.sitemap["https://www.getevents.nl"].status_code = 200
+    site.item_to_sitemap(SitemapItem(2, "https://www.getevents.nl/utrecht"))
+    late = SitemapItem(3, "https://www.getevents.nl/amsterdam")
+    site.item_to_sitemap(late)
+    assert site.get_unvisited_item(max_depth=2).path == "/utrecht"
+
+    # found again by a shorter path
+    site.item_to_sitemap(SitemapItem(1, "https://www.getevents.nl/amsterdam"))
+    assert late.depth == 1
+    assert site.get_unvisited_item(max_depth=1) is late
+
+
 async def test_basesite_get():
     site = BaseSite("https://www.inspectelement.nl")
     async with HttpClient() as client:
@@ -244,3 +302,292 @@ async def test_func_export():
 
     first_item = json.loads(export_list[0])
     assert first_item.get("title")
+
+
+async def test_build_site_single_worker_is_breadth_first():
+    site = BaseSite("https://www.getevents.nl")
+    client = FakeClient(FAKE_SITE)
+    await site.build_site(client, max_depth=5, max_pages=20)
+    assert client.requested == [
+        "https://www.getevents.nl",
+        "https://www.getevents.nl/a",
+        "https://www.getevents.nl/b",
+        "https://www.getevents.nl/a1",
+        "https://www.getevents.nl/a2",
+        "https://www.getevents.nl/b1",
+    ]
+
+
+async def test_build_site_concurrent_workers():
+    site = BaseSite("https://www.getevents.nl")
+    client = FakeClient(FAKE_SITE, delay=0.01)
+    await site.build_site(client, max_depth=5, max_pages=20, concurrency=4)
+    assert sorted(client.requested) == sorted(FAKE_SITE)
+    assert site.digested == len(FAKE_SITE)
+
+
+async def test_build_site_concurrent_max_pages():
+    site = BaseSite("https://www.getevents.nl")
+    client = FakeClient(FAKE_SITE, delay=0.01)
+    await site.build_site(client, max_depth=5, max_pages=3, concurrency=4)
+    assert len(client.requested) == 3
+    assert site.digested == 3
+
+
+async def test_run_site_concurrent_stops_on_func():
+    site = BaseSite("https://www.getevents.nl")
+    client = FakeClient(FAKE_SITE, delay=0.01)
+
+    def page_func(site, item, response):
+        return item.path == "/a"
+
+    await site.run_site(client, page_func, max_pages=20, sleep=0, concurrency=2)
+    visited = [item for item in site.sitemap.values() if item.status_code]
+    assert len(visited) < len(FAKE_SITE)
+
+
+async def test_retention_full():
+    site = BaseSite("https://www.getevents.nl")
+    await site.build_site(FakeClient(FAKE_SITE), max_depth=5)
+    item = site.sitemap["https://www.getevents.nl/a"]
+    assert item.page is not None
+    assert site.retained_bytes > 0
+
+
+async def test_retention_summary():
+    site = BaseSite("https://www.getevents.nl", retention="summary")
+
+    def page_func(site, item, response):
+        item.data["title"] = item.page.css_first("title").text()
+
+    await site.run_site(FakeClient(FAKE_SITE), page_func, sleep=0)
+    item = site.sitemap["https://www.getevents.nl/a"]
+    assert item.page is None
+    assert item.summary.internal_links == [
+        "https://www.getevents.nl/a1",
+        "https://www.getevents.nl/a2",
+    ]
+    assert item.summary.text == "/a1 /a2"
+    assert item.data["title"] == "https://www.getevents.nl/a"
+
+
+async def test_retention_none_and_memory_limit():
+    site = BaseSite("https://www.getevents.nl", retention=Retention.NONE)
+    await site.build_site(FakeClient(FAKE_SITE), max_depth=5)
+    assert all(item.page is None for item in site.sitemap.values())
+    assert site.retained_bytes == 0
+
+    site = BaseSite("https://www.getevents.nl", max_retained_bytes=1)
+    await site.build_site(FakeClient(FAKE_SITE), max_depth=5)
+    kept = [item for item in site.sitemap.values() if item.page is not None]
+    assert len(kept) == 1
+
+
+async def test_retained_bytes_are_freed(tmp_path):
+    # room for the data of all pages, not for all pages
+    site = BaseSite("https://www.getevents.nl", max_retained_bytes=2000)
+
+    def page_func(site, item, response):
+        item.data["title"] = item.page.css_first("title").text()
+
+    await site.run_site(FakeClient(FAKE_SITE), page_func, sleep=0, delete_pages=True)
+    # dropping the pages frees room for the data of the next ones
+    assert all(item.data for item in site.sitemap.values())
+    assert site.retained_bytes == sum(
+        item._retained_data_bytes for item in site.sitemap.values()
+    )
+
+    site = BaseSite(
+        "https://www.getevents.nl",
+        max_retained_bytes=1,
+        spill_path=str(tmp_path / "spill.sqlite"),
+    )
+    await site.build_site(FakeClient(FAKE_SITE), max_depth=5)
+    assert site.retained_bytes == 0
+    assert len(site.spill_store) == len(FAKE_SITE)
+
+
+def extract_title(page):
+    return {"title": page.css_first("title").text()}
+
+
+async def test_parse_executor():
+    titles = {}
+
+    def page_func(site, item, response):
+        titles[item.url] = item.data["title"]
+
+    with ParseExecutor(max_workers=2, extract=extract_title) as executor:
+        site = BaseSite("https://www.getevents.nl", parse_executor=executor)
+        await site.run_site(FakeClient(FAKE_SITE), page_func, sleep=0)
+
+    item = site.sitemap["https://www.getevents.nl/b"]
+    assert item.page is None
+    assert item.summary.internal_links == ["https://www.getevents.nl/b1"]
+    assert titles == {url: url for url in FAKE_SITE}
+    assert site.digested == 2 * len(FAKE_SITE)
+
+
+def test_parse_page_truncated():
+    html = ("<p>" + "\xe9" * 10 + '</p><a href="/a">a</a>').encode("utf-8")
+    summary, data = parse_page(
+        html[:12], "utf-8", "https://www.getevents.nl", truncated=True
+    )
+    assert summary.text == "\xe9" * 4
+
+
+async def test_incremental_recrawl(tmp_path):
+    def page_func(site, item, response):
+        item.data["title"] = item.page.css_first("title").text()
+
+    def sitemap_site(lastmods, **kwargs):
+        site = BaseSite("https://www.getevents.nl", **kwargs)
+        for path, lastmod in lastmods.items():
+            url = f"https://www.getevents.nl{path}"
+            site.item_to_sitemap(SitemapItem(1, url, lastmod=lastmod))
+        return site
+
+    first_export = str(tmp_path / "first.json")
+    site = sitemap_site(
+        {"/a": "2024-01-01", "/b": "2024-01-01"}, export_path=first_export
+    )
+    await site.run_site(
+        FakeClient(FAKE_SITE), page_func, max_depth=1, export=True, sleep=0
+    )
+
+    # unchanged urls are crawled last
+    site = sitemap_site(
+        {"/a": "2024-01-01", "/b": "2024-02-01"}, previous_export=first_export
+    )
+    client = FakeClient(FAKE_SITE)
+    await site.build_site(client, max_depth=1)
+    assert client.requested == [
+        "https://www.getevents.nl",
+        "https://www.getevents.nl/b",
+        "https://www.getevents.nl/a",
+    ]
+
+    second_export = str(tmp_path / "second.json")
+    site = sitemap_site(
+        {"/a": "2024-01-01", "/b": "2024-02-01"},
+        export_path=second_export,
+        previous_export=first_export,
+        skip_unchanged=True,
+    )
+    client = FakeClient(FAKE_SITE)
+    await site.run_site(client, page_func, max_depth=1, export=True, sleep=0)
+    assert client.requested == [
+        "https://www.getevents.nl",
+        "https://www.getevents.nl/b",
+    ]
+
+    unchanged = site.sitemap["https://www.getevents.nl/a"]
+    assert unchanged.status_code == 304
+    assert unchanged.data == {"title": "https://www.getevents.nl/a"}
+
+    previous = BaseSite.load_previous(second_export)
+    assert set(previous) == set(BaseSite.load_previous(first_export))
+    assert previous["https://www.getevents.nl/a"]["status_code"] == 304
+    assert previous["https://www.getevents.nl/b"]["changes"] == 0
+    assert previous["https://www.getevents.nl/b"]["lastmod"] == "2024-02-01"
+
+
+async def test_resume_from_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint.sqlite")
+
+    site = BaseSite(
+        "https://www.getevents.nl", checkpoint_path=path, checkpoint_every=2
+    )
+    client = FakeClient(FAKE_SITE)
+    await site.build_site(client, max_depth=5, max_pages=3)
+    assert len(client.requested) == 3
+
+    site = BaseSite("https://www.getevents.nl")
+    assert site.resume(path) == len(FAKE_SITE)
+    assert site.digested == 3
+    assert site.sitemap["https://www.getevents.nl/a"].status_code == 200
+    assert site.sitemap["https://www.getevents.nl/a2"].depth == 2
+
+    # the home page of a site made with the checkpoint path stays visited
+    site = BaseSite("https://www.getevents.nl", checkpoint_path=path)
+    site.resume()
+    site.checkpoint()
+    site = BaseSite("https://www.getevents.nl")
+    site.resume(path)
+    assert site.sitemap["https://www.getevents.nl"].status_code == 200
+
+    resumed = FakeClient(FAKE_SITE)
+    await site.build_site(resumed, max_depth=5)
+    assert sorted(client.requested + resumed.requested) == sorted(FAKE_SITE)
+    assert site.digested == len(FAKE_SITE)
+
+    # run_site digests every page twice, max_pages still covers both runs
+    path = str(tmp_path / "run_site.sqlite")
+    site = BaseSite("https://www.getevents.nl", checkpoint_path=path)
+    client = FakeClient(FAKE_SITE)
+    await site.run_site(client, lambda site, item, response: None, max_pages=4, sleep=0)
+    assert len(client.requested) == 2
+
+    site = BaseSite("https://www.getevents.nl")
+    site.resume(path)
+    resumed = FakeClient(FAKE_SITE)
+    await site.run_site(
+        resumed, lambda site, item, response: None, max_pages=8, sleep=0
+    )
+    assert len(resumed.requested) == 2
+    assert not set(client.requested) & set(resumed.requested)
+    assert site.pages_visited == 4
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+async def test_run_site_max_pages_with_concurrency(concurrency):
+    site = BaseSite("https://www.getevents.nl")
+    client = FakeClient(FAKE_SITE, delay=0.01)
+    await site.run_site(
+        client,
+        lambda site, item, response: None,
+        max_pages=4,
+        sleep=0,
+        concurrency=concurrency,
+    )
+    # run_site digests every page twice
+    assert len(client.requested) == 2
+    assert site.digested == 4
+
+
+def test_digest_redirect_status_without_location():
+    site = BaseSite("https://www.getevents.nl")
+    item = site.sitemap["https://www.getevents.nl"]
+    site.digest_response(item, HttpResponse(url=item.url, status_code=304))
+
+    assert item.status_code == 304
+    assert list(site.sitemap) == ["https://www.getevents.nl"]
+
+
+async def test_basesite_closes_exporter(tmp_path):
+    path = str(tmp_path / "export.json")
+    exporter = JsonLinesExporter(path, flush_size=100)
+    async with BaseSite("https://www.getevents.nl", exporter=exporter) as site:
+        site.export_page(SitemapItem(1, "https://www.getevents.nl/a"))
+
+    assert exporter.closed
+    assert len(BaseSite.load_previous(path)) == 1
+
+
+async def test_run_site_shares_exporter(tmp_path):
+    path = str(tmp_path / "export.json")
+    with JsonLinesExporter(path) as exporter:
+        for _ in range(2):
+            site = BaseSite("https://www.getevents.nl", exporter=exporter)
+            await site.run_site(
+                FakeClient(FAKE_SITE),
+                lambda site, item, response: None,
+                export=True,
+                sleep=0,
+            )
+        assert not exporter.closed
+
+    with open(path) as export_file:
+        assert len(export_file.read().splitlines()) == 2 * len(FAKE_SITE)
+    with pytest.raises(ValueError):
+        exporter.write({"path": "https://www.getevents.nl"})
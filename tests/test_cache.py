@@ -0,0 +1,90 @@
+import pytest
+from aiohttp import web
+
+from fastparser.cache import ResponseCache
+from fastparser.http_client import HttpClient, HttpResponse
+
+from .test_http_client import local_server
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def etag_page(sent):
+    async def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        sent.append(request.path)
+        return web.Response(
+            text="<p>Versie 1</p>", content_type="text/html", headers={"ETag": '"v1"'}
+        )
+
+    return handler
+
+
+async def test_cache_revalidates(tmp_path):
+    sent = []
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    async with local_server({"/": etag_page(sent)}) as base_url:
+        async with HttpClient(cache=cache) as client:
+            first = await client.get(base_url + "/")
+            second = await client.get(base_url + "/")
+
+    assert sent == ["/"]
+    assert not first.from_cache
+    assert second.from_cache
+    assert second.status_code == 200
+    assert second.text == "<p>Versie 1</p>"
+    assert second.content_type == "text/html"
+
+
+def test_cache_skips_responses_without_validators(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.store("https://www.getevents.nl/", HttpResponse(status_code=200, content=b""))
+    assert "https://www.getevents.nl/" not in cache
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    for path in ["a", "b"]:
+        response = HttpResponse(status_code=200, content=b"body")
+        cache.store(f"https://www.getevents.nl/{path}", response, etag=path)
+    cache.get("https://www.getevents.nl/a")
+    cache.store("https://www.getevents.nl/c", response, etag="c")
+
+    assert len(cache) == 2
+    assert "https://www.getevents.nl/a" in cache
+    assert "https://www.getevents.nl/b" not in cache
+
+
+def test_cache_max_bytes(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=10)
+    for path in ["a", "b", "c"]:
+        response = HttpResponse(status_code=200, content=b"12345")
+        cache.store(f"https://www.getevents.nl/{path}", response, etag=path)
+
+    assert cache.size == 10
+    assert "https://www.getevents.nl/a" not in cache
+
+
+def test_cache_batches_access_times(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, access_batch=2)
+    response = HttpResponse(status_code=200, content=b"12345")
+    cache.store("https://www.getevents.nl/a", response, etag="a")
+    cache.store("https://www.getevents.nl/b", response, etag="b")
+    cache.store("https://www.getevents.nl/a", response, etag="a2")
+    assert len(cache) == 2
+    assert cache.size == 10
+
+    cache.get("https://www.getevents.nl/a")
+    # not written until the batch is full or the cache closes
+    assert cache._accessed
+    cache.close()
+
+    cache = ResponseCache(path, max_entries=1)
+    assert cache.size == 10
+    cache.store("https://www.getevents.nl/c", response, etag="c")
+    assert len(cache) == 1
+    assert cache.size == 5
+    assert "https://www.getevents.nl/c" in cache
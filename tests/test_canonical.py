@@ -0,0 +1,107 @@
+import pytest
+
+from fastparser.base_site import BaseSite, SitemapItem
+from fastparser.canonical import UrlCanonicalizer
+from fastparser.http_client import HttpResponse
+from fastparser.seen import BloomFilter
+
+
+@pytest.mark.parametrize(
+    "url,canonical",
+    [
+        ("HTTP://WWW.Getevents.NL:80/", "https://www.getevents.nl"),
+        ("https://www.getevents.nl:443/ams/", "https://www.getevents.nl/ams"),
+        ("https://www.getevents.nl/ams/index.html", "https://www.getevents.nl/ams"),
+        ("https://www.getevents.nl/a/./b/../c#top", "https://www.getevents.nl/a/c"),
+        ("https://www.getevents.nl//a//b", "https://www.getevents.nl/a/b"),
+        (
+            "https://www.getevents.nl/%7Eams/caf%c3%a9",
+            "https://www.getevents.nl/~ams/caf%C3%A9",
+        ),
+        (
+            "https://www.getevents.nl/~ams/café",
+            "https://www.getevents.nl/~ams/caf%C3%A9",
+        ),
+        ("https://www.getevents.nl:8080/ams", "https://www.getevents.nl:8080/ams"),
+        ("http://[::1]:8080/a", "https://[::1]:8080/a"),
+        ("http://[::1]:80/a", "https://[::1]/a"),
+        # an invalid port is left alone
+        ("http://a.nl:abc/x", "http://a.nl:abc/x"),
+        (
+            "https://www.getevents.nl/uitjes?utm_source=x&page=2&sort=asc",
+            "https://www.getevents.nl/uitjes?page=2&sort=asc",
+        ),
+    ],
+)
+def test_canonicalize(url, canonical):
+    canonicalizer = UrlCanonicalizer(scheme="https", allowed_params=["sort", "page"])
+    assert canonicalizer(url) == canonical
+
+
+def test_trailing_slash():
+    assert UrlCanonicalizer(trailing_slash="add")("https://a.nl/b") == "https://a.nl/b/"
+    keep = UrlCanonicalizer(trailing_slash="keep")
+    assert keep("https://a.nl/b/") == "https://a.nl/b/"
+    assert keep("https://a.nl/b") == "https://a.nl/b"
+
+
+def test_sitemap_dedup():
+    site = BaseSite(
+        "https://www.getevents.nl",
+        canonicalizer=UrlCanonicalizer(scheme="https", allowed_params=["page"]),
+    )
+    for url in [
+        "http://www.getevents.nl/ams/",
+        "https://WWW.getevents.nl/ams/index.html",
+        "https://www.getevents.nl/ams?page=2",
+        "https://www.getevents.nl/ams?page=2&utm_source=x",
+        "https://www.getevents.nl/",
+    ]:
+        site.item_to_sitemap(SitemapItem(1, url))
+
+    assert list(site.sitemap) == [
+        "https://www.getevents.nl",
+        "https://www.getevents.nl/ams",
+        "https://www.getevents.nl/ams?page=2",
+    ]
+
+
+def test_redirect_to_canonical_variant_is_fetched():
+    site = BaseSite("https://www.getevents.nl", canonicalizer=UrlCanonicalizer())
+    item = SitemapItem(1, "https://www.getevents.nl/ams")
+    site.item_to_sitemap(item)
+    response = HttpResponse(
+        url=item.url, status_code=301, redirect="https://www.getevents.nl/ams/"
+    )
+    site.digest_response(item, response)
+
+    assert item.status_code == 301
+    assert site.sitemap["https://www.getevents.nl/ams/"].status_code is None
+
+
+def test_redirect_to_spilled_variant_is_not_fetched(tmp_path):
+    site = BaseSite(
+        "https://www.getevents.nl",
+        canonicalizer=UrlCanonicalizer(),
+        spill_path=str(tmp_path / "spill.sqlite"),
+    )
+    raw_item = SitemapItem(1, "https://www.getevents.nl/ams/", status_code=200)
+    site.spill_store.put(raw_item)
+
+    item = SitemapItem(1, "https://www.getevents.nl/ams")
+    site.item_to_sitemap(item)
+    response = HttpResponse(
+        url=item.url, status_code=301, redirect="https://www.getevents.nl/ams/"
+    )
+    site.digest_response(item, response)
+
+    assert "https://www.getevents.nl/ams/" not in site.sitemap
+
+    bloom = BloomFilter(capacity=100)
+    site = BaseSite(
+        "https://www.getevents.nl", canonicalizer=UrlCanonicalizer(), seen_filter=bloom
+    )
+    item = SitemapItem(1, "https://www.getevents.nl/ams")
+    site.item_to_sitemap(item)
+    site.digest_response(item, response)
+    assert "https://www.getevents.nl/ams/" in bloom
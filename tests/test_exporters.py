@@ -0,0 +1,107 @@
+import csv
+import gzip
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fastparser.exporters import (
+    Exporter,
+    JsonLinesExporter,
+    CsvExporter,
+    ParquetExporter,
+)
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+RECORDS = [
+    {"path": "https://www.getevents.nl", "status_code": 200, "title": "Home"},
+    {"path": "https://www.getevents.nl/a", "status_code": 404, "tags": ["a", "b"]},
+]
+
+
+def test_jsonl_exporter_batches(tmp_path):
+    path = tmp_path / "export.json"
+    exporter = JsonLinesExporter(str(path), flush_size=2, flush_interval=60)
+    exporter.write(RECORDS[0])
+    assert not path.exists()
+
+    exporter.write(RECORDS[1])
+    # the full batch is written in the background, an empty flush waits for it
+    exporter.flush()
+    lines = path.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == RECORDS
+
+    exporter.write(RECORDS[0])
+    exporter.close()
+    assert len(path.read_text().splitlines()) == 3
+
+
+def test_jsonl_exporter_gzip(tmp_path):
+    path = tmp_path / "export.json.gz"
+    for _ in range(2):
+        with JsonLinesExporter(str(path), compression="gzip") as exporter:
+            for record in RECORDS:
+                exporter.write(record)
+
+    with gzip.open(path, "rt") as export_file:
+        assert [json.loads(line) for line in export_file] == RECORDS * 2
+
+
+def test_exporter_compression():
+    with pytest.raises(ValueError):
+        JsonLinesExporter("export.json", compression="bz2")
+
+
+def test_csv_exporter(tmp_path):
+    path = tmp_path / "export.csv"
+    with CsvExporter(str(path), flush_size=1) as exporter:
+        for record in RECORDS:
+            exporter.write(record)
+
+    with open(path, newline="") as export_file:
+        rows = list(csv.DictReader(export_file))
+    # the columns come from the first batch
+    assert list(rows[0]) == ["path", "status_code", "title"]
+    assert rows[1] == {
+        "path": "https://www.getevents.nl/a",
+        "status_code": "404",
+        "title": "",
+    }
+
+
+def test_parquet_exporter(tmp_path):
+    pytest.importorskip("pyarrow")
+    from pyarrow import parquet
+
+    path = tmp_path / "export.parquet"
+    with ParquetExporter(str(path), flush_size=1, compression="gzip") as exporter:
+        for record in RECORDS:
+            exporter.write(record)
+
+    table = parquet.read_table(str(path))
+    assert table.num_rows == 2
+    assert table.column("title").to_pylist() == ["Home", None]
+
+
+def test_exporter_is_abstract():
+    with pytest.raises(TypeError):
+        Exporter("export.json")
+
+
+def test_exporter_flushes_at_exit(tmp_path):
+    path = tmp_path / "export.json"
+    script = f"""
+from fastparser.base_site import BaseSite, SitemapItem
+
+site = BaseSite("https://www.getevents.nl", export_path={str(path)!r})
+for page in ("a", "b", "c"):
+    site.export_page(SitemapItem(1, "https://www.getevents.nl/" + page))
+"""
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=ROOT)
+
+    assert len(path.read_text().splitlines()) == 3
@@ -1,13 +1,33 @@
 import asyncio
+import socket
+from contextlib import asynccontextmanager
 
+import aiohttp
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 
-from fastparser.http_client import HttpClient, HttpResponse
+from fastparser.http_client import HttpClient, HttpResponse, create_connector
+from fastparser.retry import RetryPolicy, RetryBudget
 
 
 pytestmark = pytest.mark.asyncio
 
 
+async def hello(request):
+    return web.Response(text="<html><p>Hallo</p></html>", content_type="text/html")
+
+
+@asynccontextmanager
+async def local_server(routes):
+    """Serves routes ({path: handler}) on localhost, yields the base url"""
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+    async with TestServer(app) as server:
+        yield str(server.make_url("")).rstrip("/")
+
+
 async def test_get_site():
     url = "https://www.getevents.nl/"
     async with HttpClient() as client:
@@ -26,4 +46,178 @@ async def test_get_site_with_redirect():
 
     assert r.url == "https://www.getevents.nl/ams"
     assert r.status_code == 301
-    assert r.redirect == "https://www.getevents.nl/uitje/amsterdamse-avond/"
\ No newline at end of file
+    assert r.redirect == "https://www.getevents.nl/uitje/amsterdamse-avond/"
+
+
+async def test_connector_options():
+    async with HttpClient(limit=10, limit_per_host=2, ipv4_only=True) as client:
+        connector = client._client.connector
+        assert connector.limit == 10
+        assert connector.limit_per_host == 2
+        assert connector._family == socket.AF_INET
+
+
+async def test_shared_session():
+    async with local_server({"/": hello}) as base_url:
+        session = aiohttp.ClientSession(connector=create_connector(limit_per_host=4))
+        async with HttpClient(session=session) as client1:
+            async with HttpClient(session=session, headers={"X-Test": "1"}) as client2:
+                r1 = await client1.get(base_url + "/")
+                r2 = await client2.get(base_url + "/")
+
+        assert not session.closed
+        await session.close()
+
+    assert r1.status_code == 200
+    assert r2.text == "<html><p>Hallo</p></html>"
+
+
+async def test_response_text_is_decoded_lazily():
+    async def latin(request):
+        return web.Response(
+            body="<p>Caf\xe9</p>".encode("latin-1"),
+            content_type="text/html",
+            charset="latin-1",
+        )
+
+    async with local_server({"/": latin}) as base_url:
+        async with HttpClient() as client:
+            r = await client.get(base_url + "/")
+
+    assert r.content == b"<p>Caf\xe9</p>"
+    assert r._text is None
+    assert r.text == "<p>Caf\xe9</p>"
+    assert r.text is r.text
+
+
+def test_response_text_undecodable():
+    r = HttpResponse(status_code=200, content=b"\xff\xfe\xfa", encoding="utf-8")
+    assert r.text == ""
+    assert HttpResponse(status_code=200, text="<p>Hallo</p>").text == "<p>Hallo</p>"
+
+
+async def big_page(request):
+    response = web.StreamResponse(headers={"Content-Type": "text/html"})
+    await response.prepare(request)
+    for _ in range(100):
+        await response.write(b"<p>" + b"x" * 1000 + b"</p>")
+    return response
+
+
+async def pdf(request):
+    return web.Response(body=b"%PDF-1.4" * 100, content_type="application/pdf")
+
+
+async def test_max_bytes_streams_and_truncates():
+    async with local_server({"/big": big_page, "/": hello}) as base_url:
+        async with HttpClient(max_bytes=5000, chunk_size=1024) as client:
+            big = await client.get(base_url + "/big")
+            small = await client.get(base_url + "/")
+            full = await client.get(base_url + "/big", max_bytes=10 ** 6)
+
+    assert big.truncated
+    assert len(big.content) == 5000
+    assert big.text.startswith("<p>xxx")
+    assert not small.truncated
+    assert small.text == "<html><p>Hallo</p></html>"
+    assert not full.truncated
+    assert len(full.content) == 100 * 1007
+
+
+async def test_max_bytes_truncates_multibyte_text():
+    async def accents(request):
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/html; charset=utf-8"}
+        )
+        await response.prepare(request)
+        await response.write(("<p>" + "\xe9" * 2000 + "</p>").encode("utf-8"))
+        return response
+
+    async with local_server({"/": accents}) as base_url:
+        async with HttpClient(max_bytes=1000) as client:
+            r = await client.get(base_url + "/")
+
+    assert r.truncated
+    assert len(r.content) == 1000
+    assert r.text == "<p>" + "\xe9" * 498
+
+
+async def test_max_bytes_content_length():
+    async with local_server({"/pdf": pdf}) as base_url:
+        async with HttpClient(max_bytes=100) as client:
+            r = await client.get(base_url + "/pdf")
+
+    assert r.truncated
+    assert r.content == b""
+
+
+async def test_content_types():
+    async with local_server({"/pdf": pdf, "/": hello}) as base_url:
+        async with HttpClient(content_types=["text/*"]) as client:
+            skipped = await client.get(base_url + "/pdf")
+            page = await client.get(base_url + "/")
+
+    assert skipped.truncated
+    assert skipped.content_type == "application/pdf"
+    assert skipped.content == b""
+    assert page.content_type == "text/html"
+    assert not page.truncated
+
+
+def flaky(failures, status=503, headers=None):
+    """Handler that fails with status for the first failures requests"""
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) <= failures:
+            return web.Response(status=status, headers=headers)
+        return await hello(request)
+
+    return handler
+
+
+async def test_retry_status_with_backoff():
+    policy = RetryPolicy(backoff=0.01, jitter=False)
+    async with local_server({"/": flaky(2)}) as base_url:
+        async with HttpClient(retry_policy=policy) as client:
+            r = await client.get(base_url + "/")
+
+    assert r.status_code == 200
+    assert [a.status_code for a in r.attempts] == [503, 503, 200]
+    assert [a.delay for a in r.attempts] == [0.01, 0.02, 0.0]
+
+
+async def test_retry_after_header():
+    policy = RetryPolicy(backoff=0.01, jitter=False)
+    handler = flaky(1, status=429, headers={"Retry-After": "1"})
+    async with local_server({"/": handler}) as base_url:
+        async with HttpClient(retry_policy=policy) as client:
+            r = await client.get(base_url + "/")
+
+    assert r.status_code == 200
+    assert r.attempts[0].delay == 1.0
+
+
+async def test_retries_run_out():
+    policy = RetryPolicy(retries=5, backoff=0.01, jitter=False)
+    async with local_server({"/": flaky(10, status=502)}) as base_url:
+        async with HttpClient(retry_policy=policy) as client:
+            r = await client.get(base_url + "/", retries=1)
+
+    assert r.status_code == 502
+    assert len(r.attempts) == 2
+
+
+async def test_retry_budget():
+    budget = RetryBudget(ratio=0.0, min_retries=1)
+    policy = RetryPolicy(backoff=0.01, budget=budget)
+    async with local_server({"/": flaky(10)}) as base_url:
+        async with HttpClient(retry_policy=policy) as client:
+            r1 = await client.get(base_url + "/")
+            r2 = await client.get(base_url + "/")
+
+    assert len(r1.attempts) == 2
+    assert len(r2.attempts) == 1
+    assert budget.requests == 2
+    assert budget.retries == 1
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from fastparser.errors import TerminalError, NonTerminalError
+from fastparser.http_client import HttpResponse
+from fastparser.orchestrator import CrawlOrchestrator
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class MultiSiteClient:
+    """Every site has a home page linking to two sub pages"""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.running = 0
+        self.max_running = 0
+
+    async def get(self, url):
+        if url in self.errors:
+            raise self.errors[url]
+        self.running += 1
+        self.max_running = max(self.running, self.max_running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        html = '<html><a href="/one">one</a><a href="/two">two</a></html>'
+        return HttpResponse(url=url, status_code=200, text=html, content=html.encode())
+
+
+async def test_orchestrator_crawls_all_sites():
+    client = MultiSiteClient()
+    urls = [f"https://www.site{i}.nl" for i in range(6)]
+    orchestrator = CrawlOrchestrator(client, max_sites=3)
+    report = await orchestrator.run(urls, max_depth=1, max_pages=10)
+
+    assert len(report.sites) == 6
+    assert report.pages == 18
+    assert report.pages_per_sec > 0
+    assert client.max_running == 3
+
+
+async def test_orchestrator_skips_non_terminal():
+    client = MultiSiteClient(
+        errors={"https://www.site1.nl": NonTerminalError("SSL error")}
+    )
+    urls = ["https://www.site0.nl", "https://www.site1.nl", "not a url"]
+    report = await CrawlOrchestrator(client).run(urls, max_depth=1)
+
+    assert [site.domain for site in report.sites] == ["www.site0.nl"]
+    assert set(report.skipped) == {"https://www.site1.nl", "not a url"}
+
+
+async def test_orchestrator_stops_on_terminal():
+    client = MultiSiteClient(
+        errors={"https://www.site1.nl": TerminalError("Proxy error")}
+    )
+    urls = [f"https://www.site{i}.nl" for i in range(20)]
+    with pytest.raises(TerminalError):
+        await CrawlOrchestrator(client, max_sites=2).run(urls, max_depth=1)
+
+
+async def test_orchestrator_counts_run_site_pages_once():
+    urls = [f"https://www.site{i}.nl" for i in range(2)]
+    report = await CrawlOrchestrator(MultiSiteClient()).run(
+        urls, func=lambda site, item, response: None, max_depth=1, sleep=0
+    )
+
+    assert report.pages == 6
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+from fastparser.ratelimit import HostRateLimiter, parse_retry_after
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+async def test_rate_per_host():
+    limiter = HostRateLimiter(rate=20, burst=1)
+
+    async def request(url):
+        async with limiter.limit(url):
+            pass
+
+    start = time.monotonic()
+    await asyncio.gather(*[request("https://www.getevents.nl/") for _ in range(4)])
+    same_host = time.monotonic() - start
+
+    start = time.monotonic()
+    await asyncio.gather(
+        *[request(f"https://www.site{i}.nl/") for i in range(4)],
+    )
+    other_hosts = time.monotonic() - start
+
+    assert same_host >= 0.14
+    assert other_hosts < 0.05
+
+
+async def test_max_in_flight():
+    limiter = HostRateLimiter(rate=1000, burst=10, max_in_flight=2)
+    running = 0
+    max_running = 0
+
+    async def request():
+        nonlocal running, max_running
+        async with limiter.limit("https://www.getevents.nl/"):
+            running += 1
+            max_running = max(running, max_running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[request() for _ in range(6)])
+    assert max_running == 2
+
+
+async def test_backoff_on_retry_after():
+    limiter = HostRateLimiter(rate=1000, burst=10)
+    limiter.feedback("https://www.getevents.nl/a", 429, "1")
+
+    async def request(url):
+        async with limiter.limit(url):
+            return time.monotonic()
+
+    start = time.monotonic()
+    other = await request("https://www.moovemarketing.nl/")
+    throttled = await request("https://www.getevents.nl/b")
+    assert other - start < 0.1
+    assert throttled - start >= 0.9
@@ -0,0 +1,49 @@
+import pytest
+
+from fastparser.base_site import BaseSite
+from fastparser.seen import BloomFilter
+from fastparser.store import ItemStore
+
+from .test_basesite import FakeClient, FAKE_SITE
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    urls = [f"https://www.getevents.nl/{i}" for i in range(1000)]
+    for url in urls:
+        bloom.add(url)
+
+    assert all(url in bloom for url in urls)
+    false_positives = sum(
+        f"https://www.moovemarketing.nl/{i}" in bloom for i in range(10000)
+    )
+    assert false_positives < 300
+    assert len(bloom._bits) < 1300
+
+
+async def test_spill_visited_items(tmp_path):
+    path = str(tmp_path / "spill.sqlite")
+    site = BaseSite(
+        "https://www.getevents.nl",
+        seen_filter=BloomFilter(capacity=100),
+        spill_path=path,
+    )
+
+    def page_func(site, item, response):
+        item.data["links"] = len(item.page.links)
+
+    client = FakeClient(FAKE_SITE)
+    await site.run_site(client, page_func, max_depth=5, sleep=0)
+
+    assert sorted(client.requested) == sorted(FAKE_SITE)
+    assert len(site.sitemap) == 0
+
+    store = ItemStore(path)
+    assert len(store) == len(FAKE_SITE)
+    item = store.get("https://www.getevents.nl/a")
+    assert item.status_code == 200
+    assert item.depth == 1
+    assert item.data == {"links": 2}
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from fastparser import serialize
+from fastparser.base_site import SitemapItem
+
+
+RECORD = {"path": "https://www.getevents.nl/café", "status_code": 200, "tags": [1, 2]}
+
+
+@pytest.mark.parametrize("backend", ["default", "stdlib"])
+def test_dumps(backend, monkeypatch):
+    if backend == "stdlib":
+        monkeypatch.setattr(serialize, "orjson", None)
+
+    data = serialize.dumps(RECORD)
+    assert isinstance(data, bytes)
+    assert json.loads(data) == RECORD
+    assert serialize.loads(data) == RECORD
+    # too big for orjson
+    assert json.loads(serialize.dumps({"id": 2 ** 70})) == {"id": 2 ** 70}
+
+    lines = serialize.dumps_lines([RECORD, {"status_code": 404}])
+    assert [json.loads(line) for line in lines.splitlines()] == [
+        RECORD,
+        {"status_code": 404},
+    ]
+    assert lines.endswith(b"\n")
+
+
+def test_sitemapitem_json():
+    item = SitemapItem(1, "https://www.getevents.nl/a", status_code=200)
+    item.data["title"] = "A"
+    assert json.loads(item.json) == {
+        "path": "https://www.getevents.nl/a",
+        "status_code": 200,
+        "title": "A",
+    }
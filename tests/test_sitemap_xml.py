@@ -0,0 +1,122 @@
+import gzip
+
+import pytest
+from aiohttp import web
+
+from fastparser.base_site import BaseSite
+from fastparser.errors import NonTerminalError
+from fastparser.http_client import HttpClient, HttpResponse
+from fastparser.sitemap_xml import SitemapParser, SitemapEntry
+
+from .test_http_client import local_server
+
+
+pytestmark = pytest.mark.asyncio
+
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://www.getevents.nl/a</loc>
+    <lastmod>2024-01-02</lastmod>
+    <priority>0.8</priority>
+  </url>
+  <url><loc> https://www.getevents.nl/b </loc></url>
+</urlset>"""
+
+
+def index(*locs):
+    sitemaps = "".join(f"<sitemap><loc>{loc}</loc></sitemap>" for loc in locs)
+    return (
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f"{sitemaps}</sitemapindex>"
+    ).encode()
+
+
+def parse_in_chunks(data, size):
+    parser = SitemapParser()
+    entries = []
+    for start in range(0, len(data), size):
+        entries.extend(parser.feed(data[start : start + size]))
+    entries.extend(parser.close())
+    return entries
+
+
+def test_sitemap_parser():
+    expected = [
+        SitemapEntry("url", "https://www.getevents.nl/a", "2024-01-02", 0.8),
+        SitemapEntry("url", "https://www.getevents.nl/b"),
+    ]
+    assert parse_in_chunks(URLSET, 7) == expected
+    assert parse_in_chunks(gzip.compress(URLSET), 1) == expected
+
+    entries = parse_in_chunks(index("https://www.getevents.nl/s.xml"), 1000)
+    assert entries == [SitemapEntry("sitemap", "https://www.getevents.nl/s.xml")]
+
+
+async def test_parse_sitemap_index():
+    def serve(body):
+        async def handler(request):
+            return web.Response(body=body, content_type="application/xml")
+
+        return handler
+
+    async def sitemap_index(request):
+        base_url = f"{request.scheme}://{request.host}"
+        paths = ("/pages.xml", "/more.xml.gz", "/missing.xml", "/sitemap.xml")
+        return await serve(index(*(base_url + path for path in paths)))(request)
+
+    async def missing(request):
+        return web.Response(status=404)
+
+    more = URLSET.replace(b"/a<", b"/c<").replace(b"/b ", b"/d ")
+    routes = {
+        "/sitemap.xml": sitemap_index,
+        "/pages.xml": serve(URLSET),
+        "/more.xml.gz": serve(gzip.compress(more)),
+        "/missing.xml": missing,
+    }
+    site = BaseSite("https://www.getevents.nl")
+    async with local_server(routes) as base_url:
+        async with HttpClient() as client:
+            await site.parse_sitemap(f"{base_url}/sitemap.xml", client)
+
+    urls = {f"https://www.getevents.nl{path}" for path in ("", "/a", "/b", "/c", "/d")}
+    assert set(site.sitemap) == urls
+    assert site.sitemap["https://www.getevents.nl/a"].lastmod == "2024-01-02"
+    assert site.sitemap["https://www.getevents.nl/c"].priority == 0.8
+    assert site.sitemap["https://www.getevents.nl/b"].lastmod is None
+
+
+class SitemapClient:
+    """Serves sitemaps from a dict, urls in errors raise"""
+
+    def __init__(self, sitemaps, errors):
+        self.sitemaps = sitemaps
+        self.errors = errors
+
+    async def get(self, url):
+        if url in self.errors:
+            raise self.errors[url]
+        return HttpResponse(url=url, status_code=200, content=self.sitemaps[url])
+
+
+async def test_parse_sitemap_skips_failing_child():
+    index_url = "https://www.getevents.nl/sitemap.xml"
+    client = SitemapClient(
+        {
+            index_url: index(
+                "https://www.getevents.nl/slow.xml",
+                "https://www.getevents.nl/pages.xml",
+            ),
+            "https://www.getevents.nl/pages.xml": URLSET,
+        },
+        {"https://www.getevents.nl/slow.xml": NonTerminalError("Timeout")},
+    )
+    site = BaseSite("https://www.getevents.nl")
+    await site.parse_sitemap(index_url, client)
+    assert "https://www.getevents.nl/b" in site.sitemap
+
+    client.errors[index_url] = NonTerminalError("Timeout")
+    with pytest.raises(NonTerminalError):
+        await site.parse_sitemap(index_url, client)
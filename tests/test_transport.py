@@ -0,0 +1,46 @@
+import pytest
+
+from fastparser.base_site import BaseSite
+from fastparser.errors import NonTerminalError
+from fastparser.http_client import HttpClient, SplashClient, HttpResponse
+from fastparser.transport import ArchiveTransport
+
+from .test_http_client import local_server, hello
+
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_record_and_replay(tmp_path):
+    path = str(tmp_path / "archive.sqlite")
+    async with local_server({"/": hello}) as base_url:
+        async with HttpClient(transport=ArchiveTransport(path, "record")) as client:
+            recorded = await client.get(base_url + "/")
+
+    # the server is gone, the archive answers
+    async with HttpClient(transport=ArchiveTransport(path)) as client:
+        replayed = await client.get(base_url + "/")
+        with pytest.raises(NonTerminalError):
+            await client.get(base_url + "/not-recorded")
+
+    assert replayed.status_code == recorded.status_code == 200
+    assert replayed.text == recorded.text
+    assert replayed.content_type == "text/html"
+
+
+async def test_replay_site(tmp_path):
+    transport = ArchiveTransport(str(tmp_path / "archive.sqlite"), "record")
+    pages = {
+        "https://www.getevents.nl": '<a href="/amsterdam">Amsterdam</a>',
+        "https://www.getevents.nl/amsterdam": '<a href="/">Home</a>',
+    }
+    for url, html in pages.items():
+        response = HttpResponse(url=url, status_code=200, content=html.encode())
+        transport.record("splash", url, response)
+    transport.mode = "replay"
+
+    site = BaseSite("https://www.getevents.nl")
+    async with SplashClient(transport=transport) as client:
+        await site.build_site(client, max_depth=1)
+
+    assert site.sitemap["https://www.getevents.nl/amsterdam"].status_code == 200